@@ -0,0 +1,83 @@
+"""
+Microbenchmark of the compiled forest engine against sklearn.
+
+Run from the repository root:
+    python -m benchmarks.compiled_forest_benchmark [--model models/model.pkl]
+"""
+import argparse
+import copy
+import pickle
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from benchmarks.synthetic import make_transactions
+from pipeline.compiled_forest import CompiledForest
+from pipeline.model_artifact import load_artifact
+from pipeline.schema import FEATURE_COLUMNS, LABEL_COLUMN
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+def sklearn_nbytes(forest: RandomForestClassifier) -> int:
+    """
+    Memory held by the node and value arrays of every tree in the forest.
+    """
+    total = 0
+    for estimator in forest.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+def time_call(func, X, min_time: float = 0.2) -> float:
+    """
+    Median seconds per call of func(X), repeating for at least min_time.
+    """
+    times = []
+    start = time.perf_counter()
+    while len(times) < 3 or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        func(X)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+def run(forest: RandomForestClassifier, X: np.ndarray) -> None:
+    # Compare against single-threaded sklearn, whose summation order is deterministic
+    forest = copy.copy(forest)
+    forest.n_jobs = 1
+    
+    start = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(forest)
+    print(f"Compiled {compiled.n_trees} trees ({len(compiled.feature)} nodes) in {time.perf_counter() - start:.2f}s")
+    print(f"Memory: sklearn trees {sklearn_nbytes(forest) / 1024 ** 2:.1f} MB "
+          f"(pickled {len(pickle.dumps(forest)) / 1024 ** 2:.1f} MB), "
+          f"compiled {compiled.nbytes / 1024 ** 2:.1f} MB")
+    
+    print(f"\n{'batch':>8} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8} {'identical':>10}")
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        identical = np.array_equal(forest.predict_proba(batch), compiled.predict_proba(batch))
+        sklearn_time = time_call(forest.predict_proba, batch)
+        compiled_time = time_call(compiled.predict_proba, batch)
+        print(f"{len(batch):>8} {sklearn_time * 1e3:>12.3f} {compiled_time * 1e3:>12.3f} "
+              f"{sklearn_time / compiled_time:>7.1f}x {str(identical):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled forest inference against sklearn")
+    parser.add_argument("--model", help="Saved model artifact to benchmark (default: train a synthetic forest)")
+    parser.add_argument("--n-estimators", type=int, default=100, help="Trees in the synthetic forest")
+    parser.add_argument("--train-rows", type=int, default=50000, help="Rows used to train the synthetic forest")
+    args = parser.parse_args()
+    
+    data = make_transactions(args.train_rows + max(BATCH_SIZES), fraud_rate=0.05)
+    X = data[FEATURE_COLUMNS].to_numpy()
+    y = data[LABEL_COLUMN].to_numpy()
+    
+    if args.model:
+        forest = load_artifact(args.model)['model']
+    else:
+        forest = RandomForestClassifier(n_estimators=args.n_estimators, random_state=42, n_jobs=-1)
+        forest.fit(X[:args.train_rows], y[:args.train_rows])
+    
+    run(forest, X[args.train_rows:])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Benchmark suite for the training and scoring pipeline.
+
+Each (stage, data size, core count) case runs in a fresh process inside a
+temporary working directory, so peak RSS is per case and nothing under
+models/ or outputs/ is touched. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 --cores 1 4
+    python -m benchmarks.run_benchmarks --stages load predict --save-baseline
+
+Every run is appended to the JSON history; cases slower or larger than the
+saved baseline by more than --tolerance are reported as regressions and make
+the command exit with status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from config import BENCHMARK_HISTORY, BENCHMARK_BASELINE
+
+STAGES = ['load', 'load_cached', 'preprocess', 'smote', 'train', 'ensemble', 'predict', 'evaluate']
+
+# Environment variables that cap the thread and process pools used by numpy,
+# sklearn and joblib; set before each case process starts
+_CORE_LIMIT_VARS = ['LOKY_MAX_CPU_COUNT', 'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def _prepared_split(n_rows: int, fraud_rate: float):
+    from benchmarks.synthetic import make_transactions
+    from pipeline.preprocessor import Preprocessor
+    
+    preprocessor = Preprocessor()
+    X, y = preprocessor.fit_transform(make_transactions(n_rows, fraud_rate))
+    return preprocessor, preprocessor.split_data(X, y)
+
+def _setup(stage: str, n_rows: int, options: Dict[str, Any]) -> Callable[[], None]:
+    """
+    Prepare inputs for a stage outside the timed region and return the
+    callable that runs the stage itself.
+    """
+    from benchmarks.synthetic import make_transactions
+    if stage in ('train', 'predict', 'evaluate'):
+        # Only where needed: importing the trainer loads sklearn and imblearn,
+        # which would inflate the peak RSS measured for the lighter stages
+        from pipeline.trainer import Trainer
+    fraud_rate = options['fraud_rate']
+    
+    if stage in ('load', 'load_cached'):
+        from pipeline.data_loader import load_data
+        make_transactions(n_rows, fraud_rate).to_csv('transactions.csv', index=False)
+        if stage == 'load_cached':
+            load_data('transactions.csv')
+            return lambda: load_data('transactions.csv')
+        return lambda: load_data('transactions.csv', use_cache=False)
+    
+    if stage == 'preprocess':
+        from pipeline.preprocessor import Preprocessor
+        df = make_transactions(n_rows, fraud_rate)
+        return lambda: Preprocessor().fit_transform(df)
+    
+    if stage == 'smote':
+        from pipeline.resampling import Resampler
+        _, (X_train, _, y_train, _) = _prepared_split(n_rows, fraud_rate)
+        return lambda: Resampler('smote', cache_dir=None).fit_resample(X_train, y_train)
+    
+    if stage == 'train':
+        _, (X_train, _, y_train, _) = _prepared_split(n_rows, fraud_rate)
+        return lambda: Trainer(tuning_strategy='halving', max_fits=options['train_max_fits']).train(X_train, y_train)
+    
+    if stage == 'ensemble':
+        from pipeline.ensemble_trainer import EnsembleTrainer
+        _, (X_train, _, y_train, _) = _prepared_split(n_rows, fraud_rate)
+        return lambda: EnsembleTrainer(n_estimators=options['n_estimators']).fit(X_train, y_train)
+    
+    if stage in ('predict', 'evaluate'):
+        from sklearn.ensemble import RandomForestClassifier
+        preprocessor, (X_train, X_test, y_train, y_test) = _prepared_split(n_rows, fraud_rate)
+        trainer = Trainer()
+        trainer.model = RandomForestClassifier(n_estimators=options['n_estimators'], random_state=42, n_jobs=-1)
+        trainer.model.fit(X_train, y_train)
+        
+        if stage == 'evaluate':
+            from pipeline.evaluator import Evaluator
+            return lambda: Evaluator().evaluate(trainer.model, X_test, y_test)
+        
+        from pipeline.predictor import Predictor
+        trainer.save_model(preprocessor)
+        make_transactions(n_rows, fraud_rate, random_state=7).to_csv('transactions.csv', index=False)
+        return lambda: Predictor().predict('transactions.csv', 'predictions.csv')
+    
+    raise ValueError(f"Unknown stage: {stage}")
+
+def _run_case(stage: str, n_rows: int, cores: int, options: Dict[str, Any], conn) -> None:
+    """
+    Body of a case process: set up, time the stage and send back the result.
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, available[:cores])
+    if not options['verbose']:
+        devnull = open(os.devnull, 'w')
+        sys.stdout = devnull
+        os.dup2(devnull.fileno(), 2)
+    
+    sys.path.insert(0, options['repo_root'])
+    workdir = tempfile.mkdtemp(prefix='fraud-bench-')
+    os.chdir(workdir)
+    try:
+        run = _setup(stage, n_rows, options)
+        rss_before = _peak_rss_mb()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        run()
+        wall = time.perf_counter() - start
+        conn.send({
+            'stage': stage,
+            'rows': n_rows,
+            'cores': cores,
+            'wall_s': wall,
+            'cpu_s': time.process_time() - cpu_start,
+            'rows_per_s': n_rows / wall if wall > 0 else None,
+            'peak_rss_mb': _peak_rss_mb(),
+            'setup_peak_rss_mb': rss_before,
+        })
+    except Exception as e:
+        conn.send({'stage': stage, 'rows': n_rows, 'cores': cores, 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        os.chdir(options['repo_root'])
+        shutil.rmtree(workdir, ignore_errors=True)
+        conn.close()
+
+def run_case(stage: str, n_rows: int, cores: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one benchmark case in a fresh process limited to the given core count.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    
+    saved_env = {var: os.environ.get(var) for var in _CORE_LIMIT_VARS}
+    os.environ.update({var: str(cores) for var in _CORE_LIMIT_VARS})
+    try:
+        process = ctx.Process(target=_run_case, args=(stage, n_rows, cores, options, child_conn))
+        process.start()
+    finally:
+        for var, value in saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+    child_conn.close()
+    
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {'stage': stage, 'rows': n_rows, 'cores': cores,
+                  'error': 'benchmark process exited without a result'}
+    process.join()
+    return result
+
+def _case_key(result: Dict[str, Any]) -> str:
+    return f"{result['stage']}/{result['rows']}/{result['cores']}"
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                        tolerance: float) -> List[str]:
+    """
+    Describe every case that passed in the baseline but fails now, or whose
+    wall time or peak RSS exceeds the baseline by more than the tolerance.
+    """
+    baseline_by_key = {_case_key(r): r for r in baseline if 'error' not in r}
+    regressions = []
+    for result in results:
+        base = baseline_by_key.get(_case_key(result))
+        if base is None:
+            continue
+        if 'error' in result:
+            regressions.append(f"{_case_key(result)} passed in baseline, fails now: {result['error']}")
+            continue
+        for metric in ('wall_s', 'peak_rss_mb'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{_case_key(result)} {metric}: {base[metric]:.3f} -> {result[metric]:.3f} "
+                                   f"({(result[metric] / base[metric] - 1) * 100:+.0f}%)")
+    return regressions
+
+def _git_revision(repo_root: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _read_json(path: str, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def _write_json(path: str, data) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fraud detection pipeline")
+    parser.add_argument("--stages", nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument("--sizes", nargs='+', type=int, default=[10000, 50000], help="Rows of synthetic data")
+    parser.add_argument("--cores", nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--fraud-rate", type=float, default=0.0017)
+    parser.add_argument("--n-estimators", type=int, default=50, help="Trees in benchmarked forests and ensembles")
+    parser.add_argument("--train-max-fits", type=int, default=300, help="Fit budget for the Trainer stage")
+    parser.add_argument("--history", default=BENCHMARK_HISTORY)
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE)
+    parser.add_argument("--save-baseline", action='store_true', help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown/growth before flagging")
+    parser.add_argument("--verbose", action='store_true', help="Show output of the benchmarked code")
+    args = parser.parse_args()
+    
+    repo_root = os.getcwd()
+    options = {'fraud_rate': args.fraud_rate, 'n_estimators': args.n_estimators,
+               'train_max_fits': args.train_max_fits, 'verbose': args.verbose, 'repo_root': repo_root}
+    
+    results = []
+    print(f"{'stage':<12} {'rows':>9} {'cores':>5} {'wall s':>9} {'cpu s':>9} {'rows/s':>11} {'peak MB':>9}")
+    for stage in args.stages:
+        for n_rows in args.sizes:
+            for cores in sorted(set(args.cores)):
+                result = run_case(stage, n_rows, cores, options)
+                results.append(result)
+                if 'error' in result:
+                    print(f"{stage:<12} {n_rows:>9} {cores:>5} failed: {result['error']}")
+                else:
+                    print(f"{stage:<12} {n_rows:>9} {cores:>5} {result['wall_s']:>9.3f} {result['cpu_s']:>9.3f} "
+                          f"{result['rows_per_s']:>11,.0f} {result['peak_rss_mb']:>9.1f}")
+    
+    run = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(repo_root),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    history = _read_json(args.history, [])
+    history.append(run)
+    _write_json(args.history, history)
+    print(f"\nResults appended to {args.history}")
+    
+    baseline = _read_json(args.baseline, None)
+    regressions = compare_to_baseline(results, baseline['results'], args.tolerance) if baseline else []
+    failed = [_case_key(result) for result in results if 'error' in result]
+    if args.save_baseline:
+        if failed:
+            # A failed case would be skipped by every later comparison
+            print(f"Baseline not saved: {len(failed)} cases failed ({', '.join(failed)})")
+        else:
+            _write_json(args.baseline, run)
+            print(f"Baseline saved to {args.baseline}")
+    
+    if regressions:
+        print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    elif baseline:
+        print(f"No regressions against {args.baseline}")
+    if args.save_baseline and failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
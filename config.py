@@ -4,14 +4,26 @@
 DATA_DIR = "data"
 MODEL_DIR = "models"
 OUTPUT_DIR = "outputs"
+CACHE_DIR = "cache"
 
 # Model configuration
 MODEL_PATH = f"{MODEL_DIR}/model.pkl"
+ENSEMBLE_MODEL_PATH = f"{MODEL_DIR}/ensemble_model.pkl"
 PREDICTION_OUTPUT = f"{OUTPUT_DIR}/predictions.csv"
 
+# Binary cache of parsed CSV files ('npy' per column, or 'parquet' if pyarrow is installed)
+DATA_CACHE_DIR = f"{CACHE_DIR}/data"
+DATA_CACHE_FORMAT = "npy"
+
+# Cache of resampled training sets, keyed by a hash of the inputs and sampler settings
+RESAMPLE_CACHE_DIR = f"{CACHE_DIR}/resampled"
+RESAMPLE_CACHE_MAX_BYTES = 4 * 1024 ** 3
+
 # Data preprocessing settings
 RANDOM_STATE = 42
 TEST_SIZE = 0.2
+# Share of the training split held out to choose the decision threshold
+VALIDATION_SIZE = 0.2
 
 # Model training settings
 N_ESTIMATORS = 100
@@ -21,3 +33,89 @@ MIN_SAMPLES_LEAF = 1
 
 # Feature scaling settings
 SCALING_FEATURES = ['Amount', 'Time']
+
+# Cost of each outcome per transaction, for choosing the decision threshold:
+# missed fraud (fn) is far more expensive than reviewing an alert (fp, tp)
+COST_MATRIX = {'tn': 0.0, 'fp': 5.0, 'fn': 100.0, 'tp': 5.0}
+
+# Bootstrap confidence intervals for the evaluation metrics
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_MAX_CELLS = 8 * 1024 ** 2  # resample x row cells per worker task (bounds memory)
+
+# Metrics of the last in-memory training run (baseline for streaming training)
+METRICS_PATH = f"{OUTPUT_DIR}/metrics.json"
+
+# Out-of-core training settings
+STREAMING_CHUNK_SIZE = 100000
+STREAMING_HOLDOUT_FRACTION = 0.2
+STREAMING_NEGATIVE_RATIO = 10  # legitimate transactions kept per fraud
+STREAMING_REPORT_PATH = f"{OUTPUT_DIR}/streaming_report.json"
+
+# Feature engineering settings
+FEATURE_FIT_CHUNK_SIZE = 100000  # rows per chunk when fitting from a CSV file
+# Trailing windows (seconds) for transaction count / amount sum / max amount features
+VELOCITY_WINDOWS = [60, 600, 3600]
+
+# Prediction settings
+PREDICTION_CHUNK_SIZE = 100000
+TOP_K_SUSPECTS = 10  # most suspicious transactions listed after scoring
+
+# GUI scoring runs on a background thread; the window polls it this often
+GUI_POLL_INTERVAL_MS = 100
+GUI_SCORING_CHUNK_SIZE = 20000  # rows scored between progress updates
+# Random forests are scored with the array-backed engine up to this batch size
+COMPILED_FOREST_MAX_BATCH = 512
+
+# Model cache settings
+MODEL_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Model versions: each save also writes models/model_vN.pkl, keeping the newest few
+MODEL_VERSIONS_KEPT = 5
+
+# Incremental refresh: trees grown on a new labelled batch. The oldest trees are
+# retired so the forest keeps its size (or REFRESH_MAX_TREES if set)
+REFRESH_NEW_TREES = 20
+REFRESH_MAX_TREES = None
+
+# Class-imbalance handling: "smote", "class_weight", "undersample" or "smote_subsample"
+RESAMPLING_STRATEGY = "smote"
+RESAMPLING_RATIO = 0.1  # frauds per legitimate transaction after undersampling
+RESAMPLING_REPORT_PATH = f"{OUTPUT_DIR}/resampling_report.json"
+
+# Hyperparameter tuning settings
+TUNING_STRATEGY = "halving"  # "halving" or "grid" (exhaustive GridSearchCV)
+TUNING_TIME_BUDGET = None  # seconds, successive halving only
+TUNING_MAX_FITS = None  # forest fits, successive halving only
+TUNING_HALVING_FACTOR = 3
+TUNING_CV_FOLDS = 3
+TUNING_REPORT_PATH = f"{OUTPUT_DIR}/tuning_report.json"
+
+# Logging settings
+LOG_DIR = "logs"
+# Per-transaction DEBUG records are throttled per logger so verbose logging can
+# stay on while scoring: every Nth record is kept, at most RATE_LIMIT per second
+LOG_DEBUG_RATE_LIMIT = 50  # records per second, None for no limit
+LOG_DEBUG_SAMPLE_EVERY = 1
+
+# Instrumentation settings
+RUN_REPORT_PATH = f"{OUTPUT_DIR}/run_report.json"
+
+# Scoring service settings
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_MAX_WAIT_MS = 2.0
+SERVICE_MAX_BATCH = 256
+
+# Spool directory scoring daemon settings
+SPOOL_DIR = f"{DATA_DIR}/spool"
+SPOOL_POLL_INTERVAL = 0.5  # seconds between directory scans
+SPOOL_SETTLE_SECONDS = 1.0  # files modified more recently may still be being written
+SPOOL_WORKERS = None  # scoring processes (default: one per CPU)
+SPOOL_MAX_CRASHES = 3  # worker crashes (e.g. out of memory) before a file is given up as failed
+SPOOL_RESULT_SUFFIX = ".scored.csv"
+SPOOL_JOURNAL = ".scored.jsonl"  # processed-file journal, kept in the spool directory
+
+# Benchmark settings
+BENCHMARK_HISTORY = f"{OUTPUT_DIR}/benchmark_history.json"
+BENCHMARK_BASELINE = "benchmarks/baseline.json"
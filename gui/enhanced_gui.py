@@ -1,14 +1,18 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
-import pandas as pd
+from tkinter import ttk, filedialog, messagebox
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from pipeline.predictor import Predictor
 from pipeline.ensemble_trainer import EnsembleTrainer
+from pipeline.model_registry import default_registry
+from gui.scoring_worker import ScoringWorker
+from gui.virtual_table import VirtualTable
 import os
+import queue
 from datetime import datetime
 from utils.logger import Logger
+from config import ENSEMBLE_MODEL_PATH, GUI_POLL_INTERVAL_MS, GUI_SCORING_CHUNK_SIZE
 
 class EnhancedFraudDetectorGUI:
     def __init__(self, root):
@@ -19,6 +23,12 @@ class EnhancedFraudDetectorGUI:
         self.logger = Logger('gui').get_logger()
         self.predictor = None
         self.model = None
+        self.worker = None
+        # Results of the last completed scoring run; the slider relabels these
+        self.df = None
+        self.y_proba = None
+        self.sorted_proba = None
+        self.flagged = None
         
         self.create_widgets()
         
@@ -39,14 +49,20 @@ class EnhancedFraudDetectorGUI:
         ttk.Button(self.main_frame, text="Browse", command=self.browse_file).grid(row=1, column=2)
         
         # Prediction controls
-        ttk.Button(self.main_frame, text="Detect Fraud", command=self.detect_fraud).grid(
-            row=2, column=0, columnspan=3, pady=10)
+        controls = ttk.Frame(self.main_frame)
+        controls.grid(row=2, column=0, columnspan=3, pady=10)
+        self.detect_button = ttk.Button(controls, text="Detect Fraud", command=self.detect_fraud)
+        self.detect_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(controls, text="Cancel", command=self.cancel_detection, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
         
-        # Threshold slider
+        # Threshold slider; starts at the model's tuned threshold once a model is loaded.
+        # Moving it relabels the cached probabilities without rescoring
         ttk.Label(self.main_frame, text="Prediction Threshold:").grid(row=3, column=0, sticky=tk.W)
         self.threshold = tk.DoubleVar(value=0.5)
-        ttk.Scale(self.main_frame, from_=0.1, to=0.9, variable=self.threshold, 
-                 orient=tk.HORIZONTAL, length=300).grid(row=3, column=1, columnspan=2)
+        ttk.Scale(self.main_frame, from_=0.01, to=0.99, variable=self.threshold, 
+                 orient=tk.HORIZONTAL, length=300,
+                 command=self.on_threshold_change).grid(row=3, column=1, columnspan=2)
         
         # Results display
         self.results_frame = ttk.LabelFrame(self.main_frame, text="Results", padding="5")
@@ -58,10 +74,28 @@ class EnhancedFraudDetectorGUI:
         # Summary tab
         self.summary_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.summary_tab, text='Summary')
+        self.summary_var = tk.StringVar()
+        ttk.Label(self.summary_tab, textvariable=self.summary_var, justify=tk.LEFT).pack(pady=10)
+        self.top_suspects_var = tk.StringVar()
+        ttk.Label(self.summary_tab, textvariable=self.top_suspects_var, justify=tk.LEFT,
+                  font=("Courier", 10)).pack(pady=10)
         
-        # Detailed results tab
+        # Detailed results tab: every scored transaction, sortable by clicking a heading
         self.detailed_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.detailed_tab, text='Detailed Results')
+        self.create_filter_bar()
+        self.results_table = VirtualTable(
+            self.detailed_tab,
+            columns=[('Row', 'Transaction ID'), ('Time', 'Time'), ('Amount', 'Amount'),
+                     ('Probability', 'Probability of Fraud'), ('Flagged', 'Flagged')],
+            height=20,
+            formats={'Amount': lambda value: f"${value:,.2f}", 'Time': lambda value: f"{value:.0f}",
+                     'Probability': lambda value: f"{value:.4f}",
+                     'Flagged': lambda value: "Yes" if value else ""},
+            on_view_change=self.on_table_view_change
+        )
+        self.results_table.pack(expand=1, fill="both", pady=5)
+        self.results_table.sort('Probability', descending=True)
         
         # Visualizations tab
         self.visualization_tab = ttk.Frame(self.tab_control)
@@ -74,11 +108,52 @@ class EnhancedFraudDetectorGUI:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.visualization_tab)
         self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         
-        # Status bar
+        # Progress and status bar
+        self.progress = ttk.Progressbar(self.main_frame, orient=tk.HORIZONTAL, length=400, mode='determinate')
+        self.progress.grid(row=5, column=0, columnspan=3, pady=(10, 0))
         self.status_var = tk.StringVar()
         ttk.Label(self.main_frame, textvariable=self.status_var).grid(
-            row=5, column=0, columnspan=3, pady=10)
+            row=6, column=0, columnspan=3, pady=10)
+        
+    def create_filter_bar(self):
+        """Filters for the detailed results table"""
+        bar = ttk.Frame(self.detailed_tab)
+        bar.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(bar, text="Min probability:").pack(side=tk.LEFT)
+        self.min_probability = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.min_probability, width=8).pack(side=tk.LEFT, padx=(2, 10))
+        ttk.Label(bar, text="Amount from:").pack(side=tk.LEFT)
+        self.min_amount = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.min_amount, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Label(bar, text="to:").pack(side=tk.LEFT)
+        self.max_amount = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.max_amount, width=10).pack(side=tk.LEFT, padx=(2, 10))
+        self.flagged_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bar, text="Flagged only", variable=self.flagged_only,
+                        command=self.apply_filters).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(bar, text="Apply", command=self.apply_filters).pack(side=tk.LEFT)
+        self.table_status = tk.StringVar()
+        ttk.Label(bar, textvariable=self.table_status).pack(side=tk.RIGHT)
+    
+    def apply_filters(self):
+        """Filter the detailed results table by the values in the filter bar"""
+        def number(var):
+            text = var.get().strip()
+            return float(text) if text else None
         
+        try:
+            min_probability = number(self.min_probability)
+            min_amount, max_amount = number(self.min_amount), number(self.max_amount)
+        except ValueError:
+            messagebox.showerror("Error", "Filters must be numbers")
+            return
+        self.results_table.set_filter('Probability', min_probability)
+        self.results_table.set_filter('Amount', min_amount, max_amount)
+        self.results_table.set_filter('Flagged', 1 if self.flagged_only.get() else None)
+    
+    def on_table_view_change(self, shown, total):
+        self.table_status.set(f"Showing {shown:,} of {total:,} transactions")
+    
     def browse_file(self):
         file_path = filedialog.askopenfilename(
             title="Select Transaction File",
@@ -93,82 +168,144 @@ class EnhancedFraudDetectorGUI:
         if not file_path:
             messagebox.showerror("Error", "Please select a transaction file first")
             return
+        if self.worker is not None:
+            return
             
         try:
-            if not self.model:
-                self.model = EnsembleTrainer.load()
-            
-            # Load and predict data
-            df = pd.read_csv(file_path)
-            X = df.drop(['Class'], axis=1, errors='ignore')
-            
-            # Get predictions
-            y_pred = self.model.predict(X, threshold=self.threshold.get())
-            y_proba = self.model.predict_proba(X)
-            
-            # Update summary tab
-            self.update_summary(df, y_pred, y_proba)
-            
-            # Update detailed results
-            self.update_detailed_results(df, y_pred, y_proba)
-            
-            # Update visualizations
-            self.update_visualizations(y_pred, y_proba)
-            
-            messagebox.showinfo("Success", "Fraud detection completed!")
-            
+            # Cached per process; reloaded only when the file on disk changes
+            model = default_registry.get(ENSEMBLE_MODEL_PATH, loader=EnsembleTrainer.load)
+            if model is not self.model:
+                self.threshold.set(getattr(model, 'threshold', 0.5))
+            self.model = model
         except Exception as e:
-            self.logger.error(f"Error during fraud detection: {str(e)}")
+            self.logger.error(f"Error loading model: {str(e)}")
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
+        
+        # Score on a background thread; the window polls it for progress and the result
+        self.worker = ScoringWorker(self.model, file_path, chunk_size=GUI_SCORING_CHUNK_SIZE)
+        self.worker.start()
+        self.detect_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress['value'] = 0
+        self.status_var.set(f"Scoring {os.path.basename(file_path)}...")
+        self.root.after(GUI_POLL_INTERVAL_MS, self.poll_worker)
+    
+    def cancel_detection(self):
+        """Ask the running scoring worker to stop after its current chunk"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_var.set("Cancelling...")
+    
+    def poll_worker(self):
+        """Handle the messages posted by the scoring worker since the last poll"""
+        worker = self.worker
+        if worker is None:
+            return
+        while True:
+            try:
+                message = worker.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'progress':
+                _, rows_scored, total_rows = message
+                self.progress['maximum'] = max(total_rows, 1)
+                self.progress['value'] = rows_scored
+                self.status_var.set(f"Scored {rows_scored:,} of {total_rows:,} transactions")
+                continue
             
-    def update_summary(self, df, y_pred, y_proba):
+            self.finish_worker()
+            if kind == 'done':
+                _, df, y_proba, report = message
+                self.logger.info(report.summary())
+                self.show_results(df, y_proba)
+                self.update_top_suspects(worker.top_suspects)
+                self.status_var.set(f"Scored {len(df):,} transactions in {worker.seconds:.1f}s")
+                messagebox.showinfo("Success", "Fraud detection completed!")
+            elif kind == 'cancelled':
+                self.progress['value'] = 0
+                self.status_var.set("Fraud detection cancelled")
+            else:
+                self.logger.error(f"Error during fraud detection: {message[1]}")
+                self.status_var.set("Fraud detection failed")
+                messagebox.showerror("Error", f"An error occurred: {message[1]}")
+            return
+        self.root.after(GUI_POLL_INTERVAL_MS, self.poll_worker)
+    
+    def finish_worker(self):
+        self.worker = None
+        self.detect_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+    
+    def show_results(self, df, y_proba):
+        """Cache a scoring run's probabilities and display them"""
+        self.df = df
+        self.y_proba = y_proba
+        # Sorted once, so the slider counts alerts with a binary search
+        self.sorted_proba = np.sort(y_proba)
+        self.flagged = y_proba >= self.threshold.get()
+        self.update_detailed_results(df, y_proba)
+        self.relabel()
+    
+    def on_threshold_change(self, _value=None):
+        if self.y_proba is not None:
+            self.relabel()
+    
+    def relabel(self):
+        """Apply the current threshold to the cached probabilities"""
+        threshold = self.threshold.get()
+        fraud_count = len(self.sorted_proba) - int(np.searchsorted(self.sorted_proba, threshold, side='left'))
+        self.update_summary(fraud_count, len(self.sorted_proba))
+        self.flagged = self.y_proba >= threshold
+        self.results_table.set_column('Flagged', self.flagged)
+        self.update_visualizations(self.flagged, self.y_proba)
+            
+    def update_summary(self, fraud_count, total_count):
         """Update the summary tab with key metrics"""
-        fraud_count = y_pred.sum()
-        total_count = len(y_pred)
-        fraud_rate = fraud_count / total_count * 100
+        fraud_rate = fraud_count / total_count * 100 if total_count else 0.0
         
         summary = f"Total Transactions: {total_count}\n"
         summary += f"Suspected Fraud: {fraud_count}\n"
         summary += f"Fraud Rate: {fraud_rate:.2f}%\n"
         summary += f"Threshold: {self.threshold.get():.2f}\n"
         
-        ttk.Label(self.summary_tab, text=summary, justify=tk.LEFT).pack(pady=10)
-        
-    def update_detailed_results(self, df, y_pred, y_proba):
-        """Update the detailed results tab"""
-        results = df.copy()
-        results['Prediction'] = y_pred
-        results['Probability'] = y_proba
-        
-        # Sort by probability of fraud
-        results = results.sort_values('Probability', ascending=False)
-        
-        # Create text widget for detailed results
-        text_widget = scrolledtext.ScrolledText(self.detailed_tab, width=100, height=20)
-        text_widget.pack(pady=10)
+        self.summary_var.set(summary)
         
-        # Display top suspicious transactions
-        for idx, row in results.head(10).iterrows():
-            text_widget.insert(tk.END, f"Transaction ID: {idx}\n")
-            text_widget.insert(tk.END, f"Amount: ${row['Amount']:.2f}\n")
-            text_widget.insert(tk.END, f"Time: {row['Time']}\n")
-            text_widget.insert(tk.END, f"Probability of Fraud: {row['Probability']:.4f}\n")
-            text_widget.insert(tk.END, "-" * 50 + "\n\n")
+    def update_top_suspects(self, top_suspects):
+        """List the most suspicious transactions ranked while scoring"""
+        lines = [f"Top {len(top_suspects)} most suspicious transactions:",
+                 f"{'Transaction ID':>15}{'Time':>12}{'Amount':>14}{'Probability':>14}"]
+        for idx, row in top_suspects.iterrows():
+            lines.append(f"{idx:>15}{row['Time']:>12.0f}{row['Amount']:>14,.2f}{row['Probability']:>14.4f}")
+        self.top_suspects_var.set("\n".join(lines))
+    
+    def update_detailed_results(self, df, y_proba):
+        """Show every scored transaction in the results table, keeping its sort and filters"""
+        self.results_table.set_data({
+            'Row': df.index.to_numpy(),
+            'Time': df['Time'].to_numpy(),
+            'Amount': df['Amount'].to_numpy(),
+            'Probability': y_proba,
+            'Flagged': self.flagged,
+        })
         
-    def update_visualizations(self, y_pred, y_proba):
+    def update_visualizations(self, flagged, y_proba):
         """Update the visualization tab"""
         self.ax.clear()
         
         # Distribution of fraud probabilities
-        self.ax.hist(y_proba[y_pred == 0], bins=20, alpha=0.5, label='Non-Fraud')
-        self.ax.hist(y_proba[y_pred == 1], bins=20, alpha=0.5, label='Fraud')
+        self.ax.hist(y_proba[~flagged], bins=20, alpha=0.5, label='Non-Fraud')
+        self.ax.hist(y_proba[flagged], bins=20, alpha=0.5, label='Fraud')
         
         self.ax.set_title('Fraud Probability Distribution')
         self.ax.set_xlabel('Probability of Fraud')
         self.ax.set_ylabel('Number of Transactions')
         self.ax.legend()
         
-        self.canvas.draw()
+        # Coalesces the redraws of a dragged slider
+        self.canvas.draw_idle()
 
 def main():
     root = tk.Tk()
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pipeline.predictor import Predictor
-import pandas as pd
+from config import PREDICTION_CHUNK_SIZE
 import os
 
 class FraudDetectorGUI:
@@ -52,14 +52,15 @@ class FraudDetectorGUI:
             return
             
         try:
+            # Streamed in chunks; the counts and the most suspicious transactions
+            # are collected while scoring, so the predictions are not read back
             predictor = Predictor()
-            predictor.predict(file_path, "outputs/gui_predictions.csv")
+            predictor.predict(file_path, "outputs/gui_predictions.csv", chunk_size=PREDICTION_CHUNK_SIZE, top_k=5)
             
             # Display results
-            df = pd.read_csv("outputs/gui_predictions.csv")
-            fraud_count = df[df['Prediction'] == 1].shape[0]
-            total_count = df.shape[0]
-            fraud_percentage = (fraud_count / total_count) * 100
+            fraud_count = predictor.summary['flagged']
+            total_count = predictor.summary['rows']
+            fraud_percentage = (fraud_count / total_count) * 100 if total_count else 0.0
             
             self.results_text.delete(1.0, tk.END)
             self.results_text.insert(tk.END, f"Fraud Detection Results:\n\n")
@@ -69,10 +70,12 @@ class FraudDetectorGUI:
             
             if fraud_count > 0:
                 self.results_text.insert(tk.END, "Top Suspected Fraud Transactions:\n")
-                top_frauds = df[df['Prediction'] == 1].head(5)
+                threshold = predictor.threshold if predictor.threshold is not None else 0.5
+                top_frauds = predictor.top_suspects[predictor.top_suspects['Probability'] >= threshold]
                 for idx, row in top_frauds.iterrows():
                     self.results_text.insert(tk.END, f"\nTransaction Time: {row['Time']}\n")
                     self.results_text.insert(tk.END, f"Amount: ${row['Amount']:.2f}\n")
+                    self.results_text.insert(tk.END, f"Probability of Fraud: {row['Probability']:.4f}\n")
                     self.results_text.insert(tk.END, "-" * 40 + "\n")
             
             messagebox.showinfo("Success", "Fraud detection completed!")
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+from pipeline.schema import FEATURE_COLUMNS, LABEL_COLUMN, ParseReport, read_transactions
+from pipeline.topk import TopKRanker
+from config import PREDICTION_CHUNK_SIZE, TOP_K_SUSPECTS
+
+_COUNT_BLOCK_SIZE = 1 << 20
+
+def count_rows(file_path: str) -> int:
+    """Number of data rows in a CSV file, counted from its line breaks"""
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_COUNT_BLOCK_SIZE), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    # The header is not a data row
+    return max(lines - 1, 0)
+
+class ScoringWorker(threading.Thread):
+    """
+    Scores a transaction file with a model on a background thread, chunk by
+    chunk, so the GUI stays responsive.
+
+    Tk widgets may only be touched from the main thread, so the worker never
+    calls into the GUI. It posts messages on `messages` for the GUI to poll:
+        ('progress', rows_scored, total_rows)
+        ('done', transactions, probabilities, parse_report)
+        ('cancelled',)
+        ('error', message)
+    """
+    def __init__(self, model, file_path: str, chunk_size: int = PREDICTION_CHUNK_SIZE,
+                 top_k: int = TOP_K_SUSPECTS):
+        """
+        Args:
+            model: Fitted model with predict_proba returning fraud probabilities
+                (the ensemble) or class probabilities
+            file_path: Transaction CSV file
+            chunk_size: Rows read and scored per step; progress and
+                cancellation are checked between steps
+            top_k: Number of most suspicious transactions ranked while
+                scoring, available as top_suspects once done
+        """
+        super().__init__(daemon=True)
+        self.model = model
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.messages: "queue.Queue" = queue.Queue()
+        self._cancelled = threading.Event()
+        self.seconds: Optional[float] = None
+        self.ranker = TopKRanker(top_k)
+        self.top_suspects: Optional[pd.DataFrame] = None
+
+    def cancel(self) -> None:
+        """Stop after the chunk being scored; the partial results are discarded"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _score(self, chunk: pd.DataFrame) -> np.ndarray:
+        proba = self.model.predict_proba(chunk.drop([LABEL_COLUMN], axis=1, errors='ignore'))
+        return proba[:, 1] if proba.ndim == 2 else proba
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        try:
+            total_rows = count_rows(self.file_path)
+            self.messages.put(('progress', 0, total_rows))
+            report = ParseReport()
+            frames, probas = [], []
+            for chunk in read_transactions(self.file_path, required=FEATURE_COLUMNS,
+                                           chunksize=self.chunk_size, report=report):
+                if self.cancelled:
+                    self.messages.put(('cancelled',))
+                    return
+                proba = self._score(chunk)
+                self.ranker.update(proba, chunk, offsets=chunk.index.to_numpy())
+                probas.append(proba)
+                frames.append(chunk)
+                # Rejected rows were read too, so count them towards progress
+                self.messages.put(('progress', report.rows + report.rejected, total_rows))
+            if self.cancelled:
+                self.messages.put(('cancelled',))
+                return
+
+            df = pd.concat(frames) if frames else pd.DataFrame(columns=FEATURE_COLUMNS)
+            y_proba = np.concatenate(probas) if probas else np.empty(0)
+            self.top_suspects = self.ranker.result()
+            self.seconds = time.perf_counter() - start
+            self.messages.put(('done', df, y_proba, report))
+        except Exception as e:
+            self.messages.put(('error', str(e)))
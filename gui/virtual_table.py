@@ -0,0 +1,194 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+
+class VirtualTable(ttk.Frame):
+    """
+    Treeview over columns of numpy arrays that only renders the visible rows.
+
+    The Treeview holds a fixed set of items, one per visible row, created
+    once; scrolling rewrites their values from the arrays. Sorting and
+    filtering work on an array of row positions (the view), so they cost a
+    few vectorized passes over the data however many rows there are, and
+    nothing is rebuilt when new data is loaded.
+    """
+    def __init__(self, parent, columns: Sequence[Tuple[str, str]], height: int = 20,
+                 formats: Optional[Dict[str, Callable]] = None, widths: Optional[Dict[str, int]] = None,
+                 on_view_change: Optional[Callable[[int, int], None]] = None):
+        """
+        Args:
+            parent: Parent widget
+            columns: (key, heading) pairs, in display order; keys name the
+                arrays passed to set_data
+            height: Number of visible rows
+            formats: Optional per-key function turning a value into display text
+            widths: Optional per-key column width in pixels
+            on_view_change: Called with (rows shown, total rows) after
+                sorting or filtering
+        """
+        super().__init__(parent)
+        self.keys = [key for key, _ in columns]
+        self.height = height
+        self.formats = formats or {}
+        self.on_view_change = on_view_change
+        self.data: Dict[str, np.ndarray] = {}
+        self.n_rows = 0
+        self.view = np.empty(0, dtype=np.intp)
+        self.offset = 0
+        self.sort_key: Optional[str] = None
+        self.descending = False
+        self.filters: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._orders: Dict[str, np.ndarray] = {}
+        self._headings = dict(columns)
+
+        self.tree = ttk.Treeview(self, columns=self.keys, show='headings', height=height, selectmode='browse')
+        for key, heading in columns:
+            self.tree.heading(key, text=heading, command=lambda key=key: self.toggle_sort(key))
+            self.tree.column(key, width=(widths or {}).get(key, 120), anchor=tk.E, stretch=True)
+        self._items = [self.tree.insert('', tk.END, values=()) for _ in range(height)]
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        # The Treeview's own scrolling is never used: it only ever holds `height` items
+        for widget in (self.tree, self.scrollbar):
+            widget.bind('<MouseWheel>', self._on_wheel)
+            widget.bind('<Button-4>', lambda event: self.scroll(-3))
+            widget.bind('<Button-5>', lambda event: self.scroll(3))
+        self.tree.bind('<Prior>', lambda event: self.scroll(-self.height))
+        self.tree.bind('<Next>', lambda event: self.scroll(self.height))
+        self.tree.bind('<Home>', lambda event: self.scroll_to(0))
+        self.tree.bind('<End>', lambda event: self.scroll_to(len(self.view)))
+
+    def set_data(self, data: Dict[str, np.ndarray]) -> None:
+        """
+        Show new data, keeping the current sort and filters.
+
+        Args:
+            data: One array per column key, all of the same length
+        """
+        lengths = {len(values) for values in data.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        self.data = {key: np.asarray(values) for key, values in data.items()}
+        self.n_rows = lengths.pop() if lengths else 0
+        self._orders = {}
+        self._update_view()
+
+    def set_column(self, key: str, values: np.ndarray) -> None:
+        """Replace one column, e.g. labels after a threshold change, and re-sort or re-filter if it is used"""
+        values = np.asarray(values)
+        if len(values) != self.n_rows:
+            raise ValueError(f"Expected {self.n_rows} values, got {len(values)}")
+        self.data[key] = values
+        self._orders.pop(key, None)
+        if key == self.sort_key or key in self.filters:
+            self._update_view()
+        else:
+            self._render()
+
+    def sort(self, key: Optional[str], descending: bool = False) -> None:
+        """Sort the rows by a column (None for the original order)"""
+        self.sort_key = key
+        self.descending = descending
+        for column in self.keys:
+            arrow = (' ▼' if descending else ' ▲') if column == key else ''
+            self.tree.heading(column, text=self._headings[column] + arrow)
+        self._update_view()
+
+    def toggle_sort(self, key: str) -> None:
+        """Sort by key, descending first, or flip the direction if already sorted by it"""
+        self.sort(key, not self.descending if key == self.sort_key else True)
+
+    def set_filter(self, key: str, minimum: Optional[float] = None, maximum: Optional[float] = None) -> None:
+        """Only show rows with minimum <= value <= maximum in a column (both None to clear)"""
+        if minimum is None and maximum is None:
+            self.filters.pop(key, None)
+        else:
+            self.filters[key] = (minimum, maximum)
+        self._update_view()
+
+    def _order(self, key: str) -> np.ndarray:
+        # Ascending stable order of a column, reused while the column is unchanged
+        if key not in self._orders:
+            self._orders[key] = np.argsort(self.data[key], kind='stable')
+        return self._orders[key]
+
+    def _update_view(self) -> None:
+        mask = None
+        for key, (minimum, maximum) in self.filters.items():
+            if key not in self.data:
+                continue
+            values = self.data[key]
+            keep = np.ones(self.n_rows, dtype=bool)
+            if minimum is not None:
+                keep &= values >= minimum
+            if maximum is not None:
+                keep &= values <= maximum
+            mask = keep if mask is None else mask & keep
+
+        if self.sort_key is not None and self.sort_key in self.data:
+            view = self._order(self.sort_key)
+            if self.descending:
+                view = view[::-1]
+            if mask is not None:
+                view = view[mask[view]]
+        else:
+            view = np.flatnonzero(mask) if mask is not None else np.arange(self.n_rows)
+        self.view = view
+        self.offset = 0
+        self._render()
+        if self.on_view_change is not None:
+            self.on_view_change(len(self.view), self.n_rows)
+
+    def _cell(self, key: str, value) -> str:
+        format_value = self.formats.get(key)
+        return format_value(value) if format_value is not None else str(value)
+
+    def _render(self) -> None:
+        """Write the rows at the current offset into the fixed Treeview items"""
+        rows = self.view[self.offset:self.offset + self.height]
+        columns = [self.data[key][rows] if key in self.data else None for key in self.keys]
+        for i, item in enumerate(self._items):
+            if i < len(rows):
+                values = [self._cell(key, column[i]) if column is not None else ''
+                          for key, column in zip(self.keys, columns)]
+            else:
+                values = [''] * len(self.keys)
+            self.tree.item(item, values=values)
+
+        total = len(self.view)
+        if total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.height) / total)
+
+    def visible_rows(self) -> np.ndarray:
+        """Positions, in the data arrays, of the rows currently shown"""
+        return self.view[self.offset:self.offset + self.height]
+
+    def scroll_to(self, offset: int) -> None:
+        """Show rows of the view starting at offset"""
+        offset = int(min(max(offset, 0), max(len(self.view) - self.height, 0)))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def scroll(self, rows: int) -> str:
+        self.scroll_to(self.offset + rows)
+        # Stop Tk from also scrolling the Treeview itself
+        return 'break'
+
+    def _on_wheel(self, event) -> str:
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, *args) -> None:
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.view)))
+        elif args[0] == 'scroll':
+            step = self.height if args[2] == 'pages' else 1
+            self.scroll(int(args[1]) * step)
@@ -2,45 +2,106 @@ from pipeline.data_loader import load_data
 from pipeline.preprocessor import Preprocessor
 from pipeline.trainer import Trainer
 from pipeline.evaluator import Evaluator
+from utils.instrumentation import instrumentation
+from config import RUN_REPORT_PATH, COST_MATRIX, BOOTSTRAP_CONFIDENCE, BOOTSTRAP_RESAMPLES, VALIDATION_SIZE
 from typing import Tuple
 import pandas as pd
+import argparse
 import sys
 import os
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train and evaluate the fraud detection model")
+    parser.add_argument("--refresh", metavar="CSV", default=None,
+                        help="Update the saved model with a newly labelled batch instead of retraining")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage timings and write a run report")
+    parser.add_argument("--report", default=RUN_REPORT_PATH, help="Where to write the run report")
+    parser.add_argument("--trace", default=None,
+                        help="Also write a Chrome trace (chrome://tracing, Perfetto) to this path")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Track peak Python heap per stage with tracemalloc (slower)")
+    return parser.parse_args()
+
+def refresh_model(file_path: str) -> None:
+    """
+    Grow new trees on a newly labelled batch and save them as a new model version.
+    """
+    print(f"Refreshing model with {file_path}...")
+    df = load_data(file_path)
+    print(f"Batch loaded with {len(df)} transactions")
+    Trainer().refresh(df)
+
+def train_and_evaluate() -> None:
+    # Load data
+    print("Loading dataset...")
+    df = load_data("data/creditcard.csv")
+    print(f"Dataset loaded with {len(df)} transactions")
+
+    # Preprocess data
+    print("\nPreprocessing data...")
+    preprocessor = Preprocessor()
+    X, y = preprocessor.fit_transform(df)
+    X_train, X_test, y_train, y_test = preprocessor.split_data(X, y)
+    # The decision threshold is chosen on a validation split, so the test
+    # split stays unseen until the final evaluation
+    X_train, X_val, y_train, y_val = preprocessor.split_data(X_train, y_train, test_size=VALIDATION_SIZE)
+    
+    # Train model
+    print("\nTraining model...")
+    trainer = Trainer()
+    trainer.train(X_train, y_train)
+    trainer.save_tuning_report()
+    print("Training complete")
+    
+    # Choose the cost-minimising decision threshold on the validation split
+    evaluator = Evaluator()
+    sweep = evaluator.threshold_sweep(y_val, trainer.model.predict_proba(X_val)[:, 1])
+    threshold = sweep['best_threshold']
+    print(f"\nCost-optimal threshold on the validation split: {threshold:.4f} "
+          f"(expected cost {sweep['best_cost']:.0f} with costs {COST_MATRIX})")
+    
+    # Evaluate model at that threshold
+    print("\nEvaluating model...")
+    metrics = evaluator.evaluate(trainer.model, X_test, y_test, threshold=threshold)
+    metrics['threshold'] = threshold
+    y_score = trainer.model.predict_proba(X_test)[:, 1]
+    
+    # The test split holds few frauds, so show how much the metrics could move
+    intervals = evaluator.bootstrap_ci(y_test, y_score, threshold=threshold)
+    print(f"\n{BOOTSTRAP_CONFIDENCE:.0%} bootstrap confidence intervals ({BOOTSTRAP_RESAMPLES} resamples):")
+    for metric, interval in intervals.items():
+        print(f"{metric}: {interval['estimate']:.4f} [{interval['lower']:.4f}, {interval['upper']:.4f}]")
+    evaluator.save_metrics({**metrics, 'confidence_intervals': intervals})
+    
+    # Save model
+    trainer.save_model(preprocessor, threshold=threshold)
+    
+    print("\nModel training and evaluation complete!")
+    print("\nModel metrics:")
+    for metric, value in metrics.items():
+        if isinstance(value, list):
+            print(f"{metric}:\n{value}")
+        else:
+            print(f"{metric}: {value:.4f}")
+
 def main():
+    args = parse_args()
+    if args.profile or args.trace or args.trace_memory:
+        instrumentation.enable(trace_memory=args.trace_memory)
+    
     try:
-        # Load data
-        print("Loading dataset...")
-        df = load_data("data/creditcard.csv")
-        print(f"Dataset loaded with {len(df)} transactions")
-
-        # Preprocess data
-        print("\nPreprocessing data...")
-        preprocessor = Preprocessor()
-        X, y = preprocessor.fit_transform(df)
-        X_train, X_test, y_train, y_test = preprocessor.split_data(X, y)
-        
-        # Train model
-        print("\nTraining model...")
-        trainer = Trainer()
-        trainer.train(X_train, y_train)
-        print("Training complete")
-        
-        # Save model
-        trainer.save_model()
-        
-        # Evaluate model
-        print("\nEvaluating model...")
-        evaluator = Evaluator()
-        metrics = evaluator.evaluate(trainer.model, X_test, y_test)
+        if args.refresh:
+            refresh_model(args.refresh)
+        else:
+            train_and_evaluate()
         
-        print("\nModel training and evaluation complete!")
-        print("\nModel metrics:")
-        for metric, value in metrics.items():
-            if isinstance(value, list):
-                print(f"{metric}:\n{value}")
-            else:
-                print(f"{metric}: {value:.4f}")
+        if instrumentation.enabled:
+            print("\nStage timings:")
+            print(instrumentation.summary())
+            instrumentation.save_report(args.report)
+            if args.trace:
+                instrumentation.save_chrome_trace(args.trace)
 
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
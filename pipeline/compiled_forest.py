@@ -0,0 +1,250 @@
+import os
+import weakref
+import numpy as np
+from typing import Optional, Union
+from pathlib import Path
+from sklearn.ensemble import RandomForestClassifier
+from config import COMPILED_FOREST_MAX_BATCH
+
+# Target number of (tree, row) pairs evaluated together; bounds scratch memory
+_BLOCK_CELLS = 1 << 20
+
+_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'classes')
+
+class CompiledForest:
+    """
+    Array-backed inference engine for a fitted RandomForestClassifier.
+    
+    All trees are flattened into contiguous arrays (split feature, threshold,
+    child indices and leaf probabilities) and evaluated for a whole block of
+    rows at once, one tree level per step. Probabilities are bit-identical to
+    RandomForestClassifier.predict_proba with n_jobs=1: rows are compared in
+    float32 against float64 thresholds and leaf probabilities are summed in
+    tree order before dividing by the number of trees, exactly as sklearn does.
+    """
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, classes: np.ndarray, max_depth: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+        self.n_features = None
+
+    @classmethod
+    def from_sklearn(cls, forest: RandomForestClassifier) -> "CompiledForest":
+        """
+        Flatten a fitted single-output RandomForestClassifier.
+        
+        Args:
+            forest: Fitted forest
+            
+        Returns:
+            CompiledForest: Engine producing the same probabilities
+        """
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+        
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(offset, offset + n_nodes)
+            
+            # Leaves point to themselves, so extra steps leave finished rows in place
+            left = np.where(is_leaf, node_ids, tree.children_left + offset)
+            right = np.where(is_leaf, node_ids, tree.children_right + offset)
+            
+            # The probabilities sklearn returns for a row landing in each node
+            proba = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            if not np.allclose(proba.sum(axis=1), 1.0):
+                # Older sklearn stores class counts and normalizes at predict time
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            
+            # Index arrays use the native index width, which np.take needs no conversion for
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.stack([left, right], axis=1).astype(np.intp))
+            values.append(proba)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+        
+        compiled = cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.ascontiguousarray(np.concatenate(children)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.array(roots, dtype=np.intp),
+            classes=np.asarray(forest.classes_),
+            max_depth=max_depth
+        )
+        compiled.n_features = forest.n_features_in_
+        return compiled
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the flattened arrays.
+        """
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Leaf node reached in every tree by every row.
+        
+        Args:
+            X: float32 array of shape (n_samples, n_features)
+            
+        Returns:
+            np.ndarray: Global node indices of shape (n_trees, n_samples)
+        """
+        n_samples = X.shape[0]
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * X.shape[1])[np.newaxis, :]
+        flat_children = self.children.reshape(-1)
+        
+        # np.take with mode='clip' skips bounds checks; all indices are valid by construction
+        node = np.repeat(self.roots[:, np.newaxis], n_samples, axis=1)
+        for _ in range(self.max_depth):
+            x = np.take(flat_X, row_offsets + np.take(self.feature, node, mode='clip'), mode='clip')
+            go_right = x > np.take(self.threshold, node, mode='clip')
+            node = np.take(flat_children, 2 * node + go_right, mode='clip')
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Class probabilities, identical to the source forest's predict_proba.
+        
+        Args:
+            X: Feature matrix of shape (n_samples, n_features)
+            
+        Returns:
+            np.ndarray: Probabilities of shape (n_samples, n_classes)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or (self.n_features is not None and X.shape[1] != self.n_features):
+            raise ValueError(f"Expected an array with {self.n_features} features, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        
+        proba = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        block = max(1, _BLOCK_CELLS // max(1, self.n_trees))
+        for start in range(0, X.shape[0], block):
+            leaves = self.apply(X[start:start + block])
+            out = proba[start:start + block]
+            # Accumulate tree by tree, in the order sklearn adds them up
+            for tree_leaves in leaves:
+                out += np.take(self.value, tree_leaves, axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predicted class labels.
+        """
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """
+        Write the flattened arrays as .npy files so other processes can
+        memory-map them with load().
+        
+        Args:
+            directory: Destination directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(directory, 'meta.npy'),
+                np.array([self.max_depth, -1 if self.n_features is None else self.n_features]))
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], mmap_mode: Optional[str] = 'r') -> "CompiledForest":
+        """
+        Load arrays written by save(), memory-mapped read-only by default.
+        
+        Args:
+            directory: Directory written by save()
+            mmap_mode: numpy memory-map mode, or None to read into memory
+            
+        Returns:
+            CompiledForest
+        """
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in _ARRAYS}
+        max_depth, n_features = np.load(os.path.join(directory, 'meta.npy'))
+        compiled = cls(max_depth=max_depth, **arrays)
+        compiled.n_features = None if n_features < 0 else int(n_features)
+        return compiled
+
+_compiled_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def compile_forest(forest: RandomForestClassifier) -> CompiledForest:
+    """
+    CompiledForest for a fitted forest, built once per forest object.
+    """
+    compiled = _compiled_cache.get(forest)
+    if compiled is None:
+        compiled = CompiledForest.from_sklearn(forest)
+        _compiled_cache[forest] = compiled
+    return compiled
+
+def compile_estimator(estimator):
+    """
+    Swap a random forest for its compiled engine where possible.
+    
+    Handles a bare RandomForestClassifier and a pipeline whose only steps
+    before the forest are resamplers, which are inactive at predict time.
+    Anything else is returned unchanged.
+    
+    Args:
+        estimator: Fitted estimator
+        
+    Returns:
+        An object with predict_proba and predict
+    """
+    if isinstance(estimator, RandomForestClassifier):
+        return compile_forest(estimator)
+    steps = getattr(estimator, 'steps', None)
+    if steps and isinstance(steps[-1][1], RandomForestClassifier):
+        samplers_only = all(
+            step == 'passthrough' or step is None or (hasattr(step, 'fit_resample') and not hasattr(step, 'transform'))
+            for _, step in steps[:-1]
+        )
+        if samplers_only:
+            return compile_forest(steps[-1][1])
+    return estimator
+
+def fast_predict_proba(estimator, X) -> np.ndarray:
+    """
+    predict_proba that uses the compiled engine for batches of up to
+    COMPILED_FOREST_MAX_BATCH rows, where it avoids sklearn's per-call
+    overhead, and the estimator itself for larger batches, where sklearn's
+    compiled tree traversal is faster, and for input with missing values.
+    Both give the same probabilities.
+    
+    Args:
+        estimator: Fitted estimator
+        X: Feature matrix
+        
+    Returns:
+        np.ndarray: Class probabilities
+    """
+    if len(X) <= COMPILED_FOREST_MAX_BATCH:
+        compiled = compile_estimator(estimator)
+        # Missing values follow the branch sklearn learned for them, which the
+        # compiled engine does not model, so such rows are left to sklearn
+        if compiled is not estimator and np.isfinite(np.asarray(X, dtype=np.float32)).all():
+            return compiled.predict_proba(X)
+    return estimator.predict_proba(X)
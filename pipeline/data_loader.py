@@ -1,14 +1,40 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
-from typing import Union
+from typing import Any, Dict, List, Optional, Union
 from pathlib import Path
-from config import DATA_DIR
+from config import DATA_DIR, DATA_CACHE_DIR, DATA_CACHE_FORMAT
+from pipeline.schema import TRANSACTION_SCHEMA, ParseReport, read_transactions
+from utils.instrumentation import stage
 
-def load_data(file_path: Union[str, Path]) -> pd.DataFrame:
+REQUIRED_COLUMNS = ['Time', 'Amount', 'Class']
+
+_MANIFEST = 'manifest.json'
+_HASH_BLOCK_SIZE = 1 << 20
+
+def load_data(file_path: Union[str, Path], columns: Optional[List[str]] = None,
+              use_cache: bool = True, mmap: bool = False) -> pd.DataFrame:
     """
     Load and validate the dataset.
     
+    Columns in the transaction schema are parsed directly into compact dtypes
+    (float32 features, int8 label); rows with missing or non-numeric values
+    are rejected while parsing.
+    
+    The first load of a CSV file writes a columnar binary copy under
+    DATA_CACHE_DIR. Later loads read that copy instead of re-parsing the CSV
+    as long as the source file's content hash still matches.
+    
     Args:
         file_path: Path to the CSV file containing transaction data
+        columns: Only load these columns. Required columns are still validated
+            against the full file.
+        use_cache: Read from and populate the binary cache
+        mmap: Memory-map cached columns instead of reading them into memory
         
     Returns:
         pd.DataFrame: Loaded and validated dataset
@@ -17,16 +43,166 @@ def load_data(file_path: Union[str, Path]) -> pd.DataFrame:
         FileNotFoundError: If the file does not exist
         ValueError: If required columns are missing
     """
-    try:
-        df = pd.read_csv(file_path)
-    except FileNotFoundError:
+    with stage('load_data', source=str(file_path)) as current:
+        df = _load(file_path, columns, use_cache, mmap)
+        current.rows = len(df)
+    return df
+
+def _load(file_path: Union[str, Path], columns: Optional[List[str]], use_cache: bool,
+          mmap: bool) -> pd.DataFrame:
+    if not os.path.exists(file_path):
         raise FileNotFoundError(f"Dataset file not found at {file_path}")
 
+    if use_cache:
+        cache_dir = _cache_dir(file_path)
+        manifest = _valid_manifest(file_path, cache_dir)
+        if manifest is not None:
+            _validate_columns(manifest['columns'], columns)
+            return _read_cache(cache_dir, manifest, columns, mmap)
+
     # Validate required columns
-    required_columns = ['Time', 'Amount', 'Class']
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    _validate_columns(list(pd.read_csv(file_path, nrows=0).columns), columns)
+
+    report = ParseReport()
+    if not use_cache and columns is not None:
+        # Parse only the requested columns
+        df = read_transactions(file_path, columns=columns, required=REQUIRED_COLUMNS, report=report)
+        print(report.summary())
+        return df
+
+    df = read_transactions(file_path, required=REQUIRED_COLUMNS, report=report)
+    print(report.summary())
+    if report.rejected:
+        df = df.reset_index(drop=True)
+
+    if use_cache:
+        try:
+            _write_cache(file_path, cache_dir, df)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Could not cache {file_path}: {e}")
+
+    if columns is not None:
+        df = df[columns]
+    return df
+
+def _validate_columns(available: List[str], requested: Optional[List[str]] = None) -> None:
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in available]
     
     if missing_columns:
         raise ValueError(f"Missing required columns: {missing_columns}")
 
-    return df
+    if requested is not None:
+        unknown_columns = [col for col in requested if col not in available]
+        if unknown_columns:
+            raise ValueError(f"Columns not in dataset: {unknown_columns}")
+
+def _cache_dir(file_path: Union[str, Path]) -> str:
+    """
+    Cache directory for a source file, unique per absolute path.
+    """
+    abs_path = os.path.abspath(file_path)
+    path_key = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(DATA_CACHE_DIR, f"{Path(file_path).stem}-{path_key}")
+
+def _file_hash(file_path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _valid_manifest(file_path: Union[str, Path], cache_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cache manifest if it still describes the source file.
+    
+    Size and modification time are checked first; the content hash is only
+    recomputed when they differ, e.g. after the file was copied or touched.
+    """
+    manifest_path = os.path.join(cache_dir, _MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(file_path)
+    if manifest.get('schema') != TRANSACTION_SCHEMA:
+        return None
+    if manifest['source_size'] != stat.st_size:
+        return None
+    if manifest['source_mtime_ns'] == stat.st_mtime_ns:
+        return manifest
+    if manifest['source_sha256'] != _file_hash(file_path):
+        return None
+
+    # Same content, new timestamp: remember it so the hash is not recomputed
+    manifest['source_mtime_ns'] = stat.st_mtime_ns
+    _write_json(manifest_path, manifest)
+    return manifest
+
+def _read_cache(cache_dir: str, manifest: Dict[str, Any], columns: Optional[List[str]],
+                mmap: bool) -> pd.DataFrame:
+    columns = manifest['columns'] if columns is None else columns
+    if manifest['format'] == 'parquet':
+        return pd.read_parquet(os.path.join(cache_dir, 'data.parquet'), columns=columns)
+
+    files = manifest['files']
+    return pd.DataFrame({
+        col: np.load(os.path.join(cache_dir, files[col]), mmap_mode='r' if mmap else None)
+        for col in columns
+    }, columns=columns, copy=False)
+
+def _write_cache(file_path: Union[str, Path], cache_dir: str, df: pd.DataFrame) -> None:
+    """
+    Write df as a columnar cache for file_path. The cache is assembled in a
+    temporary directory and renamed into place, manifest last, so a partially
+    written cache is never read.
+    """
+    cache_format = DATA_CACHE_FORMAT
+    if cache_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            cache_format = 'npy'
+    if cache_format == 'npy':
+        non_numeric = [col for col in df.columns if df[col].dtype.kind not in 'biuf']
+        if non_numeric:
+            raise ValueError(f"non-numeric columns cannot be stored as .npy: {non_numeric}")
+
+    os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+    stat = os.stat(file_path)
+    tmp_dir = tempfile.mkdtemp(dir=DATA_CACHE_DIR, prefix='.tmp-')
+    try:
+        files = {}
+        if cache_format == 'parquet':
+            df.to_parquet(os.path.join(tmp_dir, 'data.parquet'), index=False)
+        else:
+            for i, col in enumerate(df.columns):
+                files[col] = f"{i:04d}.npy"
+                np.save(os.path.join(tmp_dir, files[col]), df[col].to_numpy())
+
+        manifest = {
+            'source_path': os.path.abspath(file_path),
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'source_sha256': _file_hash(file_path),
+            'schema': TRANSACTION_SCHEMA,
+            'format': cache_format,
+            'n_rows': len(df),
+            'columns': list(df.columns),
+            'files': files,
+        }
+        _write_json(os.path.join(tmp_dir, _MANIFEST), manifest)
+
+        if os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
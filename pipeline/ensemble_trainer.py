@@ -1,19 +1,81 @@
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import cross_val_score, StratifiedKFold
+from sklearn.model_selection import StratifiedKFold
 from sklearn.metrics import roc_auc_score, precision_score, recall_score, f1_score
-from sklearn.base import BaseEstimator, ClassifierMixin
-from imblearn.over_sampling import SMOTE
-from imblearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.utils.class_weight import compute_sample_weight
+from joblib import Parallel, delayed
 import numpy as np
 import joblib
-import os
+import time
 from utils.logger import Logger
+from config import ENSEMBLE_MODEL_PATH, COST_MATRIX, RESAMPLING_STRATEGY
+from pipeline.model_artifact import save_artifact
+from pipeline.compiled_forest import fast_predict_proba
+from pipeline.evaluator import Evaluator
+from pipeline.resampling import Resampler
+from pipeline.resample_cache import data_fingerprint
+from utils.instrumentation import instrumentation, stage, worker_timer, worker_timing
+
+def _take(data, idx):
+    return data.iloc[idx] if hasattr(data, 'iloc') else data[idx]
+
+def _fit_fold(model, X_train, y_train, X_test=None, y_test=None, balance_weights=False):
+    """
+    Fit a clone of model on the (already resampled) training rows and score
+    ROC-AUC on the test rows, if given. With balance_weights, the model is
+    fitted with balanced sample weights (for models without a class_weight
+    parameter).
+    """
+    started = worker_timer()
+    model = clone(model)
+    sample_weight = compute_sample_weight('balanced', y_train) if balance_weights else None
+    model.fit(X_train, y_train, sample_weight=sample_weight)
+    if X_test is None:
+        return model, None, worker_timing(started)
+    score = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    return model, score, worker_timing(started)
+
+class FoldAveragedClassifier(BaseEstimator, ClassifierMixin):
+    """Classifier that averages the probabilities of models fitted on different CV folds"""
+    def __init__(self, estimators):
+        self.estimators = estimators
+    
+    @property
+    def classes_(self):
+        # Derived from the already-fitted fold models, so __init__ only stores its parameters
+        return self.estimators[0].classes_
+    
+    def predict_proba(self, X):
+        return np.mean([fast_predict_proba(estimator, X) for estimator in self.estimators], axis=0)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
 
 class EnsembleTrainer(BaseEstimator, ClassifierMixin):
-    def __init__(self, n_estimators=100, random_state=42):
+    def __init__(self, n_estimators=100, random_state=42, cv_strategy='fold_average', n_splits=5, n_jobs=-1,
+                 resampling=RESAMPLING_STRATEGY):
+        """
+        Args:
+            n_estimators: Number of trees / boosting stages in the base models
+            random_state: Random seed
+            cv_strategy: 'fold_average' keeps the models fitted on the CV folds and
+                averages them, so no base model is refit; 'refit' additionally fits
+                each base model on the full data and keeps only that one
+            n_splits: Number of cross-validation folds
+            n_jobs: Cores shared by all base models and folds while training
+            resampling: Class-imbalance strategy applied inside each fold (see
+                pipeline.resampling)
+        """
+        if cv_strategy not in ('fold_average', 'refit'):
+            raise ValueError(f"Unknown cv_strategy: {cv_strategy}")
         self.n_estimators = n_estimators
         self.random_state = random_state
+        self.cv_strategy = cv_strategy
+        self.n_splits = n_splits
+        self.n_jobs = n_jobs
+        self.resampling = resampling
+        self.threshold = 0.5
         self.models = []
         self.logger = Logger('ensemble_trainer').get_logger()
         
@@ -39,46 +101,91 @@ class EnsembleTrainer(BaseEstimator, ClassifierMixin):
     def fit(self, X, y):
         """Train the ensemble model"""
         self.logger.info("Starting ensemble training...")
+        start = time.perf_counter()
         
-        # Create SMOTE pipeline for each model
-        for name, model in self.create_base_models():
-            pipeline = Pipeline([
-                ('smote', SMOTE(random_state=self.random_state)),
-                ('model', model)
-            ])
-            
-            # Perform cross-validation
-            cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=self.random_state)
-            scores = cross_val_score(
-                pipeline, X, y,
-                cv=cv,
-                scoring='roc_auc',
-                n_jobs=-1
+        base_models = self.create_base_models()
+        resampler = Resampler(self.resampling, random_state=self.random_state)
+        # Without resampling, models lacking class_weight are given balanced sample weights
+        balance_weights = {
+            name: resampler.class_weight is not None and 'class_weight' not in model.get_params()
+            for name, model in base_models
+        }
+        
+        cv = StratifiedKFold(n_splits=self.n_splits, shuffle=True, random_state=self.random_state)
+        splits = list(cv.split(X, y))
+        if self.cv_strategy == 'refit':
+            splits.append((None, None))
+        
+        # Each training fold is resampled once and shared by all base models; held-out
+        # rows are never resampled. Resampled folds come back memory-mapped from the
+        # resample cache, so the workers read them from disk instead of receiving copies
+        data_key = data_fingerprint(X, y) if resampler.cache is not None and resampler.class_weight is None else None
+        folds = []
+        with stage('ensemble_resample', rows=len(y), folds=len(splits), strategy=self.resampling):
+            for train, test in splits:
+                X_train, y_train = resampler.fit_resample(X, y, rows=train, data_key=data_key)
+                X_test, y_test = (_take(X, test), _take(y, test)) if test is not None else (None, None)
+                folds.append((train, X_train, y_train, X_test, y_test))
+                self.logger.debug(f"Fold resampled in {resampler.report['resample_seconds']:.2f}s "
+                                  f"(cached: {resampler.report['cached']})")
+        
+        # Every (model, fold) fit, plus the full-data refits in 'refit' mode, is an
+        # independent task in one pool, so the base models train concurrently
+        tasks = [(name, model, fold) for name, model in base_models for fold in folds]
+        
+        with stage('ensemble_fit', rows=len(y), tasks=len(tasks)):
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(_fit_fold)(model, X_train, y_train, X_test, y_test, balance_weights[name])
+                for name, model, (_, X_train, y_train, X_test, y_test) in tasks
             )
+        
+        fold_numbers = {}
+        for (name, _, (train, *_)), (_, score, timing) in zip(tasks, results):
+            fold = fold_numbers[name] = fold_numbers.get(name, -1) + 1
+            instrumentation.record('cv_fold' if train is not None else 'refit',
+                                   rows=len(train) if train is not None else len(y), model=name,
+                                   fold=fold if train is not None else None, score=score, **timing)
+        
+        self.models = []
+        for name, _ in base_models:
+            fold_results = [result for task, result in zip(tasks, results) if task[0] == name and task[2][0] is not None]
+            scores = np.array([score for _, score, _ in fold_results])
+            fit_time = sum(timing['wall'] for _, _, timing in fold_results)
             
             # Log cross-validation results
             self.logger.info(f"{name} CV scores: {scores}")
-            self.logger.info(f"{name} Mean CV score: {scores.mean():.4f}")
+            self.logger.info(f"{name} Mean CV score: {scores.mean():.4f} (fold fit time {fit_time:.1f}s)")
             
-            # Train on full dataset
-            pipeline.fit(X, y)
-            self.models.append((name, pipeline))
+            if self.cv_strategy == 'refit':
+                full_fit = next(result for task, result in zip(tasks, results) if task[0] == name and task[2][0] is None)
+                self.models.append((name, full_fit[0]))
+            else:
+                self.models.append((name, FoldAveragedClassifier([model for model, _, _ in fold_results])))
             
-        self.logger.info("Ensemble training completed")
+        self.logger.info(f"Ensemble training completed in {time.perf_counter() - start:.1f}s")
         return self
     
     def predict_proba(self, X):
         """Get probability predictions from all models"""
         probas = []
         for _, model in self.models:
-            probas.append(model.predict_proba(X)[:, 1])
+            probas.append(fast_predict_proba(model, X)[:, 1])
         return np.mean(probas, axis=0)
     
-    def predict(self, X, threshold=0.5):
-        """Get final predictions"""
+    def predict(self, X, threshold=None):
+        """Get final predictions, at the tuned threshold unless one is given"""
+        if threshold is None:
+            threshold = getattr(self, 'threshold', 0.5)
         probas = self.predict_proba(X)
         return (probas >= threshold).astype(int)
     
+    def tune_threshold(self, X, y, cost_matrix=COST_MATRIX):
+        """Set the decision threshold that minimises the expected cost on (X, y)"""
+        sweep = Evaluator().threshold_sweep(y, self.predict_proba(X), cost_matrix)
+        self.threshold = sweep['best_threshold']
+        self.logger.info(f"Cost-optimal threshold: {self.threshold:.4f} (expected cost {sweep['best_cost']:.0f})")
+        return sweep
+    
     def evaluate(self, X, y):
         """Evaluate the ensemble model"""
         y_pred = self.predict(X)
@@ -97,13 +204,14 @@ class EnsembleTrainer(BaseEstimator, ClassifierMixin):
         
         return metrics
     
-    def save(self, path='models/ensemble_model.pkl'):
+    def save(self, path=ENSEMBLE_MODEL_PATH):
         """Save the ensemble model"""
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        joblib.dump(self, path)
+        # Written to a temporary file and moved into place so a running GUI
+        # never hot-reloads a partially written model
+        save_artifact(self, path)
         self.logger.info(f"Model saved to {path}")
     
     @classmethod
-    def load(cls, path='models/ensemble_model.pkl'):
+    def load(cls, path=ENSEMBLE_MODEL_PATH):
         """Load the ensemble model"""
         return joblib.load(path)
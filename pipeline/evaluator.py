@@ -1,13 +1,95 @@
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
-from typing import Tuple
+from typing import Any, Dict, Optional, Tuple
+from joblib import Parallel, delayed
+import json
 import numpy as np
 import pandas as pd
+from config import (METRICS_PATH, COST_MATRIX, BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE,
+                    BOOTSTRAP_MAX_CELLS)
+from utils.instrumentation import stage
+
+BOOTSTRAP_METRICS = ('precision', 'recall', 'f1_score', 'roc_auc')
+
+def metrics_from_counts(tn: int, fp: int, fn: int, tp: int) -> Dict[str, Any]:
+    """
+    The metrics of Evaluator.evaluate computed from confusion matrix counts,
+    for evaluations accumulated chunk by chunk.
+    
+    Args:
+        tn, fp, fn, tp: Confusion matrix counts
+        
+    Returns:
+        dict: Dictionary containing evaluation metrics
+    """
+    total = tn + fp + fn + tp
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'accuracy': (tp + tn) / total if total else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'confusion_matrix': [[int(tn), int(fp)], [int(fn), int(tp)]]
+    }
+
+def _histogram_metrics(hist: np.ndarray, first_flagged: int) -> np.ndarray:
+    """
+    Metrics for resamples summarised as counts per (score group, class).
+    
+    Args:
+        hist: (n_resamples, n_groups, 2) counts of legitimate / fraud rows in
+            each group of tied scores, groups in ascending score order
+        first_flagged: First group at or above the threshold
+        
+    Returns:
+        Array of shape (n_resamples, 4) in BOOTSTRAP_METRICS order
+    """
+    negative, positive = hist[:, :, 0], hist[:, :, 1]
+    positives = positive.sum(axis=1)
+    negatives = negative.sum(axis=1)
+    
+    # Precision, recall and F1 at the threshold
+    tp = positive[:, first_flagged:].sum(axis=1)
+    alerts = tp + negative[:, first_flagged:].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(alerts > 0, tp / alerts, 0.0)
+        recall = np.where(positives > 0, tp / positives, np.nan)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    
+    # Rank-based ROC-AUC: a fraud beats every legitimate transaction in lower
+    # score groups and half of those tied with it
+    negative_below = np.cumsum(negative, axis=1) - negative
+    wins = (positive * (negative_below + negative / 2)).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc = np.where((positives > 0) & (negatives > 0), wins / (positives * negatives), np.nan)
+    
+    return np.column_stack([precision, recall, f1, auc])
+
+def _bootstrap_chunk(seed: np.random.SeedSequence, n_resamples: int, row_codes: np.ndarray,
+                     n_groups: int, first_flagged: int) -> np.ndarray:
+    """
+    Metrics for a block of bootstrap resamples (run in a worker process).
+    
+    The block is drawn as one (n_resamples, n) index matrix. Each draw is
+    mapped to its row's (score group, class) code and the codes of all
+    resamples are counted with a single bincount, so there is no loop over
+    resamples.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(row_codes)
+    idx = rng.integers(0, n, size=(n_resamples, n), dtype=np.int32)
+    codes = row_codes[idx].astype(np.int64)
+    del idx
+    codes += (np.arange(n_resamples, dtype=np.int64) * 2 * n_groups)[:, None]
+    hist = np.bincount(codes.ravel(), minlength=n_resamples * 2 * n_groups)
+    return _histogram_metrics(hist.reshape(n_resamples, n_groups, 2), first_flagged)
 
 class Evaluator:
     """
     Class for evaluating the performance of the fraud detection model.
     """
-    def evaluate(self, model, X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    def evaluate(self, model, X_test: pd.DataFrame, y_test: pd.Series,
+                 threshold: Optional[float] = None) -> dict:
         """
         Evaluate the model performance and return metrics.
         
@@ -15,21 +97,27 @@ class Evaluator:
             model: Trained model
             X_test: Test feature matrix
             y_test: Test target vector
+            threshold: Fraud probability at which a transaction is flagged;
+                None uses the model's own predict
             
         Returns:
             dict: Dictionary containing evaluation metrics
         """
-        # Get predictions
-        y_pred = model.predict(X_test)
-        
-        # Calculate metrics
-        metrics = {
-            'accuracy': accuracy_score(y_test, y_pred),
-            'precision': precision_score(y_test, y_pred),
-            'recall': recall_score(y_test, y_pred),
-            'f1_score': f1_score(y_test, y_pred),
-            'confusion_matrix': confusion_matrix(y_test, y_pred).tolist()
-        }
+        with stage('evaluate', rows=len(y_test)):
+            # Get predictions
+            if threshold is None:
+                y_pred = model.predict(X_test)
+            else:
+                y_pred = (model.predict_proba(X_test)[:, 1] >= threshold).astype(int)
+            
+            # Calculate metrics
+            metrics = {
+                'accuracy': accuracy_score(y_test, y_pred),
+                'precision': precision_score(y_test, y_pred),
+                'recall': recall_score(y_test, y_pred),
+                'f1_score': f1_score(y_test, y_pred),
+                'confusion_matrix': confusion_matrix(y_test, y_pred).tolist()
+            }
         
         # Print detailed report
         print("\nModel Evaluation Report:")
@@ -40,3 +128,156 @@ class Evaluator:
         print(classification_report(y_test, y_pred))
         
         return metrics
+
+    def bootstrap_ci(self, y_true, y_score, threshold: float = 0.5, n_resamples: int = BOOTSTRAP_RESAMPLES,
+                     confidence: float = BOOTSTRAP_CONFIDENCE, n_jobs: int = -1,
+                     random_state: Optional[int] = 42) -> Dict[str, Dict[str, float]]:
+        """
+        Percentile bootstrap confidence intervals for precision, recall, F1
+        and ROC-AUC.
+        
+        Resamples are drawn in blocks, each an index matrix evaluated with
+        vectorized numpy, and the blocks are spread over a process pool.
+        Each block has its own seed, so results do not depend on n_jobs.
+        
+        Args:
+            y_true: True labels (1 = fraud)
+            y_score: Fraud probabilities
+            threshold: Probability at which a transaction is flagged
+            n_resamples: Number of bootstrap resamples
+            confidence: Coverage of the intervals
+            n_jobs: Worker processes (-1 for all cores)
+            random_state: Seed for the resample draws
+            
+        Returns:
+            dict: For each metric, the 'estimate' on the full data and the
+            bootstrap 'lower', 'upper' bounds and 'std'
+        """
+        fraud = np.asarray(y_true).astype(bool)
+        y_score = np.asarray(y_score, dtype=np.float64)
+        n = len(fraud)
+        if n == 0:
+            raise ValueError("No rows to bootstrap")
+        # Every row is reduced to a (score group, class) code shared by all
+        # resamples. Only the order relative to fraud scores and the threshold
+        # matters, so group k ties with key k and group k - 1 lies between keys,
+        # which keeps the number of groups near twice the number of frauds
+        keys = np.unique(np.append(y_score[fraud], threshold))
+        position = np.searchsorted(keys, y_score, side='left')
+        tied = keys[np.minimum(position, len(keys) - 1)] == y_score
+        groups = 2 * position + tied
+        n_groups = 2 * len(keys) + 1
+        row_codes = (groups * 2 + fraud).astype(np.int32)
+        first_flagged = 2 * int(np.searchsorted(keys, threshold)) + 1
+        
+        # Blocks are sized by memory only, so the draws do not depend on n_jobs
+        block = max(1, min(n_resamples, BOOTSTRAP_MAX_CELLS // n))
+        sizes = [min(block, n_resamples - start) for start in range(0, n_resamples, block)]
+        seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+        
+        with stage('bootstrap', rows=n, resamples=n_resamples):
+            blocks = Parallel(n_jobs=n_jobs)(
+                delayed(_bootstrap_chunk)(seed, size, row_codes, n_groups, first_flagged)
+                for seed, size in zip(seeds, sizes)
+            )
+            samples = np.vstack(blocks)
+        # The full data is the resample in which every row appears once
+        full = np.bincount(row_codes, minlength=2 * n_groups).reshape(1, n_groups, 2)
+        estimates = _histogram_metrics(full, first_flagged)[0]
+        
+        alpha = (1 - confidence) / 2
+        intervals = {}
+        for j, name in enumerate(BOOTSTRAP_METRICS):
+            values = samples[:, j]
+            lower, upper = np.nanquantile(values, [alpha, 1 - alpha])
+            intervals[name] = {
+                'estimate': float(estimates[j]),
+                'lower': float(lower),
+                'upper': float(upper),
+                'std': float(np.nanstd(values)),
+            }
+        return intervals
+
+    def threshold_sweep(self, y_true, y_score, cost_matrix: Dict[str, float] = COST_MATRIX) -> Dict[str, Any]:
+        """
+        Metrics and expected cost at every decision threshold, from one sort.
+        
+        Transactions are flagged when their score is >= the threshold. Scores
+        are sorted once in descending order; the confusion counts at every
+        distinct score then follow from cumulative sums, so the sweep is
+        O(n log n) however many thresholds there are.
+        
+        Args:
+            y_true: True labels (1 = fraud)
+            y_score: Fraud probabilities or scores
+            cost_matrix: Cost per transaction of each outcome ('tn', 'fp', 'fn', 'tp')
+            
+        Returns:
+            dict: Arrays over the candidate thresholds (highest first, starting
+            with inf for 'flag nothing'): 'threshold', 'tp', 'fp', 'fn', 'tn',
+            'precision', 'recall', 'f1', 'alerts', 'alert_rate', 'cost'; and
+            'best_threshold', 'best_index', 'best_cost' for the cheapest one
+        """
+        y_true = np.asarray(y_true).astype(bool, copy=False)
+        y_score = np.asarray(y_score, dtype=np.float64)
+        n = len(y_true)
+        
+        with stage('threshold_sweep', rows=n):
+            order = np.argsort(-y_score, kind='stable')
+            scores = y_score[order]
+            tp = np.cumsum(y_true[order])
+            # Counts at the last position of each distinct score
+            ends = np.append(np.flatnonzero(np.diff(scores)), n - 1) if n else np.zeros(0, dtype=np.intp)
+            tp = np.concatenate(([0], tp[ends]))
+            alerts = np.concatenate(([0], ends + 1))
+            thresholds = np.concatenate(([np.inf], scores[ends]))
+            
+            fp = alerts - tp
+            fn = tp[-1] - tp if n else tp
+            tn = n - alerts - fn
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # No alerts: precision 0, as in metrics_from_counts and the bootstrap
+                precision = np.where(alerts > 0, tp / alerts, 0.0)
+                recall = np.where(tp[-1] > 0, tp / max(tp[-1], 1), 0.0)
+                f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+            cost = (cost_matrix['tp'] * tp + cost_matrix['fp'] * fp
+                    + cost_matrix['fn'] * fn + cost_matrix['tn'] * tn)
+            
+            # Ties go to the highest threshold, i.e. the fewest alerts
+            best = int(np.argmin(cost))
+        
+        # Halfway to the next lower score, so scores close to the chosen one
+        # on new data fall on the same side as on this data
+        if best == 0:
+            # Flag nothing: just above the highest score
+            best_threshold = float(np.nextafter(thresholds[1], np.inf)) if len(thresholds) > 1 else 1.0
+        elif best + 1 < len(thresholds):
+            best_threshold = float((thresholds[best] + thresholds[best + 1]) / 2)
+        else:
+            best_threshold = float(thresholds[best])
+        
+        return {
+            'threshold': thresholds,
+            'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'alerts': alerts,
+            'alert_rate': alerts / n if n else alerts.astype(np.float64),
+            'cost': cost,
+            'best_index': best,
+            'best_threshold': best_threshold,
+            'best_cost': float(cost[best]),
+        }
+
+    def save_metrics(self, metrics: Dict[str, Any], path: str = METRICS_PATH) -> None:
+        """
+        Save evaluation metrics as JSON, e.g. as the baseline for other training modes.
+        
+        Args:
+            metrics: Metrics returned by evaluate
+            path: Destination path
+        """
+        with open(path, 'w') as f:
+            json.dump(metrics, f, indent=2, default=float)
+        print(f"Metrics saved to {path}")
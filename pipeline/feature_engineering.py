@@ -1,59 +1,275 @@
 import numpy as np
 import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.decomposition import IncrementalPCA
+from config import FEATURE_FIT_CHUNK_SIZE, VELOCITY_WINDOWS
+from pipeline.schema import FEATURE_COLUMNS, LABEL_COLUMN, read_transactions
+from pipeline.velocity_features import VelocityState, compute_velocity_features, velocity_feature_names
+
+ENGINEERED_FEATURES = ['Hour', 'DayOfWeek', 'Weekend', 'LogAmount', 'SqrtAmount', 'TransactionRate']
+
+# Training data for fit(): a frame, a CSV path read in chunks, or a callable
+# returning a fresh iterable of chunks for each pass
+FitData = Union[pd.DataFrame, str, Path, Callable[[], Iterable[pd.DataFrame]]]
 
 class FeatureEngineer:
-    def __init__(self):
+    """
+    Derived time/amount and velocity features, standard scaling, PCA and
+    univariate feature selection.
+
+    fit() streams over the training data in two passes (scaler and class
+    statistics, then IncrementalPCA), so the data never has to fit in memory.
+    transform() applies the fitted steps without refitting; scaling,
+    projection and selection are folded into a single affine map computed
+    in float32.
+    """
+    def __init__(self, variance: float = 0.95, k: int = 20, chunk_size: int = FEATURE_FIT_CHUNK_SIZE,
+                 velocity_windows: Optional[Sequence[int]] = VELOCITY_WINDOWS):
+        """
+        Args:
+            variance: Fraction of variance the kept principal components explain
+            k: Number of principal components kept by the ANOVA F-test
+            chunk_size: Rows per chunk when fitting from a CSV path
+            velocity_windows: Trailing windows in seconds for the velocity
+                features, or None to leave them out. When fitting from chunks,
+                the chunks must be in time order
+        """
+        self.variance = variance
+        self.k = k
+        self.chunk_size = chunk_size
+        self.velocity_windows = list(velocity_windows) if velocity_windows else []
         self.scaler = StandardScaler()
-        self.pca = PCA(n_components=0.95)  # Keep 95% variance
-        self.selector = SelectKBest(f_classif, k=20)  # Select top 20 features
+        self.pca = None
+        self.n_components = None
+        self.f_scores = None
         self.selected_features = None
-    
+        self.input_features = FEATURE_COLUMNS + ENGINEERED_FEATURES + velocity_feature_names(self.velocity_windows)
+        self._weights = None
+        self._offset = None
+
     def create_time_features(self, df):
         """Create time-based features"""
         df['Hour'] = df['Time'] % 24
         df['DayOfWeek'] = (df['Time'] // (24 * 3600)) % 7
         df['Weekend'] = (df['DayOfWeek'] >= 5).astype(int)
         return df
-    
+
     def create_amount_features(self, df):
         """Create amount-based features"""
         df['LogAmount'] = np.log(df['Amount'] + 1)
         df['SqrtAmount'] = np.sqrt(df['Amount'])
         return df
-    
+
     def create_transaction_patterns(self, df):
         """Create transaction pattern features"""
-        df['TransactionRate'] = df['Amount'] / df['Time']
-        df['TransactionRate'] = df['TransactionRate'].fillna(0)
+        rate = df['Amount'] / df['Time']
+        # Time == 0 gives inf (or nan for a zero amount)
+        df['TransactionRate'] = rate.where(np.isfinite(rate), 0)
+        return df
+
+    def create_velocity_features(self, df):
+        """Create transaction count / amount sum / max amount features over trailing windows"""
+        features = compute_velocity_features(df['Time'].to_numpy(), df['Amount'].to_numpy(), self.velocity_windows)
+        df[velocity_feature_names(self.velocity_windows)] = features
         return df
-    
-    def transform(self, df):
-        """Apply all feature transformations"""
-        # Create new features
-        df = self.create_time_features(df)
-        df = self.create_amount_features(df)
-        df = self.create_transaction_patterns(df)
-        
-        # Scale features
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        df[numeric_cols] = self.scaler.fit_transform(df[numeric_cols])
-        
-        # Apply PCA
-        pca_features = self.pca.fit_transform(df[numeric_cols])
-        df_pca = pd.DataFrame(pca_features, columns=[f'PC_{i}' for i in range(pca_features.shape[1])])
-        
-        # Select best features
-        X = df_pca
-        y = df['Class'] if 'Class' in df.columns else None
-        
-        if y is not None:
-            self.selector.fit(X, y)
-            self.selected_features = X.columns[self.selector.get_support()]
-            X = X[self.selected_features]
+
+    @staticmethod
+    def _engineered(X: np.ndarray) -> np.ndarray:
+        """Derived features for rows of FEATURE_COLUMNS, in ENGINEERED_FEATURES order"""
+        time = X[:, FEATURE_COLUMNS.index('Time')]
+        amount = X[:, FEATURE_COLUMNS.index('Amount')]
+        out = np.empty((len(X), len(ENGINEERED_FEATURES)), dtype=X.dtype)
+        np.mod(time, 24, out=out[:, 0])
+        np.mod(np.floor_divide(time, 24 * 3600), 7, out=out[:, 1])
+        np.greater_equal(out[:, 1], 5, out=out[:, 2])
+        np.log1p(amount, out=out[:, 3])
+        np.sqrt(amount, out=out[:, 4])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(amount, time, out=out[:, 5])
+        out[~np.isfinite(out[:, 5]), 5] = 0
+        return out
+
+    def _chunks(self, data: FitData) -> Iterator[pd.DataFrame]:
+        if isinstance(data, pd.DataFrame):
+            yield data
+        elif isinstance(data, (str, Path)):
+            yield from read_transactions(data, columns=FEATURE_COLUMNS + [LABEL_COLUMN],
+                                         required=FEATURE_COLUMNS + [LABEL_COLUMN], chunksize=self.chunk_size)
+        else:
+            yield from data()
+
+    def _derived(self, X: np.ndarray, velocity_state: Optional[VelocityState] = None) -> np.ndarray:
+        """Engineered and velocity features for rows of FEATURE_COLUMNS"""
+        engineered = self._engineered(X)
+        if not self.velocity_windows:
+            return engineered
+        time = X[:, FEATURE_COLUMNS.index('Time')]
+        amount = X[:, FEATURE_COLUMNS.index('Amount')]
+        if velocity_state is not None:
+            velocity = velocity_state.update_batch(time, amount)
+        else:
+            velocity = compute_velocity_features(time, amount, self.velocity_windows)
+        return np.hstack([engineered, velocity.astype(X.dtype, copy=False)])
+
+    def _velocity_state(self) -> Optional[VelocityState]:
+        # Carries the windows across chunk boundaries during one pass over the data
+        return VelocityState(self.velocity_windows) if self.velocity_windows else None
+
+    def _matrix(self, chunk: pd.DataFrame, velocity_state: Optional[VelocityState] = None) -> np.ndarray:
+        X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        return np.hstack([X, self._derived(X, velocity_state)])
+
+    def fit(self, data: FitData, y: Optional[pd.Series] = None) -> "FeatureEngineer":
+        """
+        Fit the scaler, PCA and feature selection, streaming over the data.
+
+        Args:
+            data: A DataFrame, a CSV path (read in chunks of chunk_size rows),
+                or a callable returning a fresh iterable of DataFrame chunks;
+                it is iterated twice. Chunks hold FEATURE_COLUMNS and, for
+                feature selection, the Class label
+            y: Labels when data is a DataFrame without a Class column
+
+        Returns:
+            self
+        """
+        if isinstance(data, pd.DataFrame) and y is not None:
+            data = data.assign(**{LABEL_COLUMN: np.asarray(y)})
+
+        # Pass 1: scaler statistics and per-class sums / cross products of the
+        # (shifted) inputs, from which the F-test of any linear projection follows
+        self.scaler = StandardScaler()
+        shift = None
+        class_stats: Dict[int, List] = {}
+        n_rows = 0
+        velocity_state = self._velocity_state()
+        for chunk in self._chunks(data):
+            if chunk.empty:
+                continue
+            X = self._matrix(chunk, velocity_state)
+            self.scaler.partial_fit(X)
+            n_rows += len(X)
+            if LABEL_COLUMN not in chunk.columns:
+                continue
+            if shift is None:
+                shift = X.mean(axis=0)
+            X -= shift
+            labels = chunk[LABEL_COLUMN].to_numpy()
+            for label in np.unique(labels):
+                rows = X[labels == label]
+                stats = class_stats.setdefault(int(label), [0, 0.0, 0.0])
+                stats[0] += len(rows)
+                stats[1] = stats[1] + rows.sum(axis=0)
+                stats[2] = stats[2] + rows.T @ rows
+        if n_rows == 0:
+            raise ValueError("No rows to fit the feature engineering on")
+
+        # Pass 2: IncrementalPCA on the scaled inputs. Its first batch needs at
+        # least as many rows as features, so small chunks are held back until then
+        n_features = len(self.input_features)
+        if n_rows < n_features:
+            raise ValueError(f"Need at least {n_features} rows to fit PCA, got {n_rows}")
+        self.pca = IncrementalPCA(n_components=n_features)
+        pending = []
+        n_pending = 0
+        velocity_state = self._velocity_state()
+        for chunk in self._chunks(data):
+            if chunk.empty:
+                continue
+            X = self.scaler.transform(self._matrix(chunk, velocity_state))
+            if pending is not None:
+                pending.append(X)
+                n_pending += len(X)
+                if n_pending < n_features:
+                    continue
+                X = np.vstack(pending)
+                pending = None
+            self.pca.partial_fit(X)
+
+        # Keep the fewest components explaining the requested variance
+        ratio_cumsum = np.cumsum(self.pca.explained_variance_ratio_)
+        self.n_components = min(int(np.searchsorted(ratio_cumsum, self.variance, side='right')) + 1, n_features)
+        components = self.pca.components_[:self.n_components]
+
+        if len(class_stats) > 1:
+            self.f_scores = self._f_scores(components / self.scaler.scale_, class_stats)
+            k = min(self.k, self.n_components)
+            order = np.argsort(np.nan_to_num(self.f_scores, nan=-np.inf), kind='mergesort')
+            selected = np.sort(order[-k:])
         else:
-            X = X[self.selected_features]
-        
-        return X
+            # Without labels (or with a single class) every component is kept
+            self.f_scores = None
+            selected = np.arange(self.n_components)
+        self.selected_features = pd.Index([f'PC_{i}' for i in selected])
+
+        # transform() computes ((X - mean) / scale - pca_mean) @ C.T as X @ W + b
+        W = (components[selected] / self.scaler.scale_).T
+        self._weights = W.astype(np.float32)
+        self._offset = (-(self.scaler.mean_ / self.scaler.scale_ + self.pca.mean_) @ components[selected].T).astype(np.float32)
+        return self
+
+    @staticmethod
+    def _f_scores(directions: np.ndarray, class_stats: Dict[int, List]) -> np.ndarray:
+        """
+        ANOVA F statistic (as f_classif) of each projection X @ direction,
+        computed from per-class sums and cross products of X.
+        """
+        counts = np.array([stats[0] for stats in class_stats.values()], dtype=np.float64)
+        sums = np.array([stats[1] for stats in class_stats.values()])
+        crosses = np.array([stats[2] for stats in class_stats.values()])
+        n, n_classes = counts.sum(), len(counts)
+
+        class_means = (sums @ directions.T) / counts[:, None]
+        overall_mean = (counts @ class_means) / n
+        between = counts @ (class_means - overall_mean) ** 2
+        # sum over classes of d' (Q_c - s_c s_c' / n_c) d
+        scatter = crosses - np.einsum('ci,cj->cij', sums, sums) / counts[:, None, None]
+        within = np.einsum('ki,cij,kj->k', directions, scatter, directions)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (between / (n_classes - 1)) / (within / (n - n_classes))
+
+    def transform(self, X: Union[pd.DataFrame, np.ndarray], out: Optional[np.ndarray] = None,
+                  velocity_state: Optional[VelocityState] = None):
+        """
+        Apply the fitted feature engineering without refitting.
+
+        The input is not modified. A float32 array in FEATURE_COLUMNS order
+        is used as is, with no intermediate copy of the full input.
+
+        Args:
+            X: DataFrame containing FEATURE_COLUMNS (other columns, such as the
+                label, are ignored), or an array of rows in FEATURE_COLUMNS order
+            out: Optional float32 array of shape (n_rows, len(selected_features))
+                to write the result into
+            velocity_state: Stream state to compute the velocity features
+                against (and update); without it, velocity windows only see
+                the transactions in X
+
+        Returns:
+            DataFrame of the selected components for DataFrame input,
+            otherwise a float32 array
+        """
+        if self._weights is None:
+            raise ValueError("FeatureEngineer not fitted yet")
+        frame_index = X.index if isinstance(X, pd.DataFrame) else None
+        if frame_index is not None:
+            X = X[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+            if X.ndim != 2 or X.shape[1] != len(FEATURE_COLUMNS):
+                raise ValueError(f"Expected rows of {len(FEATURE_COLUMNS)} features in FEATURE_COLUMNS order")
+
+        n_base = len(FEATURE_COLUMNS)
+        result = np.matmul(X, self._weights[:n_base], out=out)
+        result += self._derived(X, velocity_state) @ self._weights[n_base:]
+        result += self._offset
+
+        if frame_index is not None:
+            return pd.DataFrame(result, columns=self.selected_features, index=frame_index)
+        return result
+
+    def fit_transform(self, df: pd.DataFrame, y: Optional[pd.Series] = None):
+        """Fit on df and return its transformed features"""
+        return self.fit(df, y).transform(df)
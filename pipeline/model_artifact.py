@@ -0,0 +1,125 @@
+import glob
+import os
+import re
+import shutil
+import tempfile
+from joblib import dump, load
+from typing import Any, Dict, List, Optional, Union
+from pathlib import Path
+from config import MODEL_PATH, MODEL_VERSIONS_KEPT
+
+def build_artifact(model, scaler=None, scaling_features: Optional[List[str]] = None,
+                   feature_order: Optional[List[str]] = None, **metadata) -> Dict[str, Any]:
+    """
+    Bundle a trained model with the preprocessing it was trained with.
+    
+    Args:
+        model: Trained estimator
+        scaler: Fitted scaler for the scaling features, or None if the model
+            expects raw features
+        scaling_features: Columns the scaler was fitted on, in scaler order
+        feature_order: Column order of the training feature matrix
+        **metadata: Extra entries stored alongside the model
+        
+    Returns:
+        dict: Model artifact
+    """
+    artifact = {
+        'model': model,
+        'scaler': scaler,
+        'scaling_features': list(scaling_features) if scaling_features is not None else None,
+        'feature_order': list(feature_order) if feature_order is not None else None,
+    }
+    artifact.update(metadata)
+    return artifact
+
+def save_artifact(artifact: Dict[str, Any], path: Union[str, Path] = MODEL_PATH) -> None:
+    """
+    Write a model artifact to disk. The file is written next to its final
+    location and moved into place, so readers never see a partial file.
+    
+    Args:
+        artifact: Model artifact created by build_artifact
+        path: Destination path
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _versioned_path(path: Union[str, Path], version: int) -> str:
+    root, ext = os.path.splitext(str(path))
+    return f"{root}_v{version}{ext}"
+
+def artifact_versions(path: Union[str, Path] = MODEL_PATH) -> List[int]:
+    """
+    Versions saved next to path by save_versioned_artifact, oldest first.
+    """
+    root, ext = os.path.splitext(str(path))
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'_v(\d+)' + re.escape(ext) + '$')
+    versions = []
+    for candidate in glob.glob(f"{glob.escape(root)}_v*{ext}"):
+        match = pattern.match(os.path.basename(candidate))
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+def save_versioned_artifact(artifact: Dict[str, Any], path: Union[str, Path] = MODEL_PATH,
+                            keep: Optional[int] = MODEL_VERSIONS_KEPT) -> int:
+    """
+    Save an artifact as the next numbered version (model_vN.pkl next to
+    model.pkl) and make it the current model at path. Both files are
+    replaced atomically, so readers of path see either version in full.
+    
+    Args:
+        artifact: Model artifact created by build_artifact; its 'version'
+            entry is set here
+        path: Path of the current model
+        keep: Number of versioned files to keep (None keeps all)
+        
+    Returns:
+        int: The version number assigned
+    """
+    existing = artifact_versions(path)
+    version = existing[-1] + 1 if existing else 1
+    artifact['version'] = version
+    versioned_path = _versioned_path(path, version)
+    save_artifact(artifact, versioned_path)
+    
+    # Copy rather than dump again; os.replace keeps the switch atomic
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(versioned_path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    
+    if keep is not None:
+        for old in (existing + [version])[:-keep]:
+            os.remove(_versioned_path(path, old))
+    return version
+
+def load_artifact(path: Union[str, Path] = MODEL_PATH) -> Dict[str, Any]:
+    """
+    Load a model artifact from disk. Files containing a bare estimator, as
+    written by older versions, are wrapped in an artifact without preprocessing.
+    
+    Args:
+        path: Path to the saved artifact
+        
+    Returns:
+        dict: Model artifact
+    """
+    obj = load(path)
+    if isinstance(obj, dict) and 'model' in obj:
+        return obj
+    return build_artifact(obj)
@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Union
+from pathlib import Path
+from config import MODEL_CACHE_MAX_BYTES
+from pipeline.model_artifact import load_artifact
+
+class _Entry:
+    __slots__ = ('mtime_ns', 'size', 'obj')
+
+    def __init__(self, mtime_ns: int, size: int, obj: Any):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.obj = obj
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded model artifacts.
+    
+    Entries are keyed on the absolute path and validated against the file's
+    modification time, so a retrained file that lands on disk is picked up on
+    the next lookup. The new object replaces the old entry in a single step;
+    callers still holding the previous object keep using it unchanged.
+    Least recently used entries are evicted once the combined on-disk size of
+    the cached artifacts exceeds the memory budget.
+    """
+    def __init__(self, max_bytes: int = MODEL_CACHE_MAX_BYTES,
+                 loader: Callable[[str], Any] = load_artifact):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, path: Union[str, Path], loader: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Return the artifact at path, loading it only if it is not cached or
+        the file has changed since it was loaded.
+        
+        Args:
+            path: Path to the saved artifact
+            loader: Function used to load the file; defaults to the registry loader
+            
+        Returns:
+            The loaded artifact
+            
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        
+        cached = self._lookup(key, stat)
+        if cached is not None:
+            return cached
+        
+        # Load outside the registry lock so other models stay available, but
+        # make concurrent callers of the same path wait for a single load
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            cached = self._lookup(key, stat)
+            if cached is not None:
+                return cached
+            
+            obj = (loader or self.loader)(key)
+            with self._lock:
+                self._entries[key] = _Entry(stat.st_mtime_ns, stat.st_size, obj)
+                self._entries.move_to_end(key)
+                self._evict()
+            return obj
+
+    def _lookup(self, key: str, stat: os.stat_result) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                return None
+            self._entries.move_to_end(key)
+            return entry.obj
+
+    def _evict(self) -> None:
+        # Never evict the most recently used entry, even if it alone exceeds the budget
+        total = sum(entry.size for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
+
+    def invalidate(self, path: Optional[Union[str, Path]] = None) -> None:
+        """
+        Drop one cached artifact, or all of them if no path is given.
+        
+        Args:
+            path: Path of the artifact to drop
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def cached_bytes(self) -> int:
+        """
+        Combined on-disk size of the cached artifacts.
+        """
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+# Shared by every Predictor and GUI in the process
+default_registry = ModelRegistry()
@@ -0,0 +1,237 @@
+"""
+Multi-process scoring of a single large transaction file.
+
+Scoring one file with Predictor.predict is bound by pandas parsing and CSV
+writing on one core, however many cores the forest itself uses. Here the
+data lines are split into contiguous byte ranges (shards) that start and
+end on line boundaries; every worker parses, scores and writes its own
+shard, and the shard outputs are concatenated in file order:
+
+    python -m pipeline.predictor data/transactions.csv --workers 4
+
+The output file, summary and top suspects are the same as a single-process
+run. Shards are cut at newlines, so records must not contain quoted line
+breaks (transaction files are all numeric).
+
+Where the platform can fork, workers inherit the parent's loaded model, so
+its trees are shared copy-on-write rather than pickled to each worker.
+Elsewhere each worker loads the model once.
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from config import PREDICTION_CHUNK_SIZE, TOP_K_SUSPECTS
+from pipeline.schema import ParseReport, read_transactions
+from pipeline.topk import TopKRanker
+
+# Byte range [start, end) of whole data lines
+Shard = Tuple[int, int]
+
+# Per worker process: the Predictor, inherited from the parent or loaded by _init_worker
+_predictor = None
+
+def _init_worker() -> None:
+    """Process pool initializer for start methods that cannot inherit the model"""
+    global _predictor
+    from pipeline.predictor import Predictor
+    _predictor = Predictor()
+    _predictor.load_model()
+
+def shard_ranges(file_path: Union[str, Path], n_shards: int) -> Tuple[bytes, List[Shard]]:
+    """
+    Split the data lines of a CSV file into contiguous byte ranges of
+    roughly equal size, each starting at the beginning of a line.
+
+    Args:
+        file_path: CSV file with a header line
+        n_shards: Number of ranges wanted
+
+    Returns:
+        tuple: The header line, and at most n_shards non-empty (start, end) ranges in file order
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, n_shards):
+            target = data_start + (size - data_start) * i // n_shards
+            if target <= bounds[-1]:
+                continue
+            # The shard boundary is the start of the first line beginning at or after target
+            f.seek(target - 1)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    shards = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return header, shards
+
+class ShardReader(io.RawIOBase):
+    """
+    Read-only file object over the header line followed by one shard of a
+    file, so the shard parses as a complete CSV file.
+    """
+    def __init__(self, file_path: Union[str, Path], header: bytes, shard: Shard):
+        super().__init__()
+        self._file = open(file_path, 'rb')
+        self._header = header
+        self._start, self._end = shard
+        self._size = len(header) + self._end - self._start
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = min(max(base + offset, 0), self._size)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        if self._pos >= self._size or not len(view):
+            return 0
+        if self._pos < len(self._header):
+            data = self._header[self._pos:self._pos + len(view)]
+        else:
+            offset = self._start + self._pos - len(self._header)
+            self._file.seek(offset)
+            data = self._file.read(min(len(view), self._end - offset))
+        view[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def _score_shard(file_path: str, header: bytes, shard: Shard, part_path: str,
+                 chunk_size: int, top_k: int) -> Dict[str, Any]:
+    """
+    Parse, score and write one shard in a worker process.
+
+    Returns:
+        dict: Rows read from the shard (scored or rejected), rows scored,
+        alerts, the shard's top suspects (offsets relative to the shard)
+        and the scoring time
+    """
+    start = time.perf_counter()
+    predictor = _predictor
+    report = ParseReport()
+    ranker = TopKRanker(top_k)
+    scored = 0
+    flagged = 0
+    with io.BufferedReader(ShardReader(file_path, header, shard)) as source, open(part_path, 'w', newline='') as out:
+        chunks = read_transactions(source, required=predictor.feature_order, chunksize=chunk_size, report=report)
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            df, proba = predictor._score_chunk(chunk)
+            ranker.update(proba, chunk, offsets=chunk.index.to_numpy())
+            flagged += int(np.sum(df['Prediction'].to_numpy() == 1))
+            scored += len(df)
+            df.to_csv(out, header=False, index=False)
+    return {
+        'consumed': report.rows + report.rejected,
+        'rows': scored,
+        'rejected': report.rejected,
+        'flagged': flagged,
+        'top_suspects': ranker.result(),
+        'seconds': time.perf_counter() - start,
+    }
+
+def predict_parallel(predictor, input_file: Union[str, Path], output_file: Union[str, Path],
+                     workers: int, chunk_size: Optional[int] = None, top_k: int = TOP_K_SUSPECTS) -> int:
+    """
+    Score a CSV file with a pool of worker processes, one shard each.
+
+    Sets predictor.summary and predictor.top_suspects as Predictor.predict does.
+
+    Args:
+        predictor: Predictor with its model loaded
+        input_file: Path to the input CSV file containing new transactions
+        output_file: Path where predictions will be saved
+        workers: Number of worker processes (and shards)
+        chunk_size: Rows parsed at a time within a shard (default: PREDICTION_CHUNK_SIZE)
+        top_k: Number of most suspicious transactions to keep
+
+    Returns:
+        Number of rows scored
+    """
+    global _predictor
+    start = time.perf_counter()
+    input_file = str(input_file)
+    header, shards = shard_ranges(input_file, workers)
+    # Fail on a bad header here, rather than once per worker
+    read_transactions(io.BytesIO(header), required=predictor.feature_order)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Workers inherit the loaded model instead of each unpickling a copy
+        _predictor = predictor
+        pool_args = {'mp_context': multiprocessing.get_context('fork')}
+    else:
+        pool_args = {'initializer': _init_worker}
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    part_dir = tempfile.mkdtemp(prefix='.shards-', dir=output_dir)
+    part_paths = [os.path.join(part_dir, f"part-{i:05d}.csv") for i in range(len(shards))]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(shards)
+    try:
+        with ProcessPoolExecutor(max_workers=max(min(workers, len(shards)), 1), **pool_args) as pool:
+            futures = {pool.submit(_score_shard, input_file, header, shard, part_path,
+                                   chunk_size or PREDICTION_CHUNK_SIZE, top_k): i
+                       for i, (shard, part_path) in enumerate(zip(shards, part_paths))}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = result = future.result()
+                rate = result['rows'] / result['seconds'] if result['seconds'] > 0 else float('inf')
+                print(f"Shard {i + 1}/{len(shards)}: {result['rows']} rows in {result['seconds']:.2f}s "
+                      f"({rate:,.0f} rows/sec)")
+
+        # Concatenate the shard outputs in file order behind one header line
+        tmp_path = os.path.join(part_dir, 'predictions.csv')
+        with open(tmp_path, 'w', newline='') as out:
+            pd.DataFrame(columns=predictor.feature_order + ['Prediction']).to_csv(out, index=False)
+            for part_path in part_paths:
+                with open(part_path, 'r', newline='') as part:
+                    shutil.copyfileobj(part, out)
+        os.replace(tmp_path, output_file)
+    finally:
+        _predictor = None
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    # Shard row offsets become file row offsets
+    ranker = TopKRanker(top_k)
+    consumed = 0
+    for result in results:
+        top = result['top_suspects']
+        ranker.update(top['Probability'].to_numpy(), top.drop(columns='Probability'),
+                      offsets=top.index.to_numpy() + consumed)
+        consumed += result['consumed']
+
+    total_rows = sum(result['rows'] for result in results)
+    rejected = sum(result['rejected'] for result in results)
+    predictor.summary = {'rows': total_rows, 'flagged': sum(result['flagged'] for result in results)}
+    predictor.top_suspects = ranker.result()
+
+    elapsed = time.perf_counter() - start
+    rate = total_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"Parsed {total_rows} rows ({rejected} rejected)")
+    print(f"Scored {total_rows} transactions with {workers} workers in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    print(f"Predictions saved to {output_file}")
+    return total_rows
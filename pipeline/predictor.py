@@ -1,9 +1,21 @@
+import argparse
+import time
+import warnings
+import numpy as np
 import pandas as pd
-from joblib import load
-from typing import Union
+from typing import Any, Dict, Optional, Tuple, Union
 from pathlib import Path
 from sklearn.preprocessing import StandardScaler
-from config import MODEL_PATH, PREDICTION_OUTPUT
+from config import MODEL_PATH, PREDICTION_OUTPUT, PREDICTION_CHUNK_SIZE, SCALING_FEATURES, TOP_K_SUSPECTS
+from pipeline.model_registry import default_registry
+from pipeline.compiled_forest import fast_predict_proba
+from pipeline.parallel_scoring import predict_parallel
+from pipeline.schema import FEATURE_COLUMNS, ParseReport, read_transactions
+from pipeline.topk import TopKRanker
+from utils.instrumentation import stage
+
+# Feature order the model was trained on
+REQUIRED_FEATURES = FEATURE_COLUMNS
 
 class Predictor:
     """
@@ -11,48 +23,215 @@ class Predictor:
     """
     def __init__(self):
         self.model = None
+        self.scaler = None
+        self.feature_order = REQUIRED_FEATURES
+        self.scaling_features = SCALING_FEATURES
+        self._scale_idx = None
+        self._scale_mean = None
+        self._scale_std = None
+        self._row = None
+        self.threshold = None
+        # Set by predict(): row and alert counts, and the top_k most suspicious transactions
+        self.summary = None
+        self.top_suspects = None
 
     def load_model(self) -> None:
         """
-        Load the trained model from disk.
+        Load the trained model and its fitted preprocessing. The artifact is
+        read from disk only the first time, or after the file has changed.
         """
         try:
-            self.model = load(MODEL_PATH)
+            artifact = default_registry.get(MODEL_PATH)
         except FileNotFoundError:
             raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Please train the model first.")
+        
+        self.model = artifact['model']
+        self.scaler = artifact['scaler']
+        # Decision threshold chosen at training time; None predicts the most probable class
+        self.threshold = artifact.get('threshold')
+        self.feature_order = artifact['feature_order'] or REQUIRED_FEATURES
+        # An empty list marks a model that scales its own inputs (e.g. a Pipeline)
+        if artifact['scaling_features'] is not None:
+            self.scaling_features = artifact['scaling_features']
+        else:
+            self.scaling_features = SCALING_FEATURES
+        
+        # Precompute the scaling as column indices and arrays for the numpy fast path
+        self._scale_idx = np.array([self.feature_order.index(f) for f in self.scaling_features], dtype=np.intp)
+        if self.scaler is not None:
+            self._scale_mean = np.asarray(self.scaler.mean_, dtype=np.float64)
+            self._scale_std = np.asarray(self.scaler.scale_, dtype=np.float64)
+        self._row = np.empty((1, len(self.feature_order)), dtype=np.float64)
+
+    def _prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Validate, reorder and scale a batch of transactions.
+        
+        Args:
+            df: Raw transaction data
+            
+        Returns:
+            pd.DataFrame: Feature matrix in training column order
+        """
+        # Check if all required features are present
+        missing_features = [feat for feat in self.feature_order if feat not in df.columns]
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+        
+        # Reorder columns to match training data
+        df = df[self.feature_order].copy()
+        
+        # Scale features with the scaler fitted at training time
+        if self.scaler is not None:
+            df[self.scaling_features] = self.scaler.transform(df[self.scaling_features])
+        elif self.scaling_features:
+            # Models saved without preprocessing: fall back to scaling per batch
+            scaler = StandardScaler()
+            for feature in self.scaling_features:
+                df[feature] = scaler.fit_transform(df[[feature]])
+        
+        return df
 
-    def predict(self, input_file: Union[str, Path], output_file: Union[str, Path] = PREDICTION_OUTPUT) -> None:
+    def _scale_array(self, X: np.ndarray) -> None:
+        """
+        Scale the scaling features of a raw feature array in place.
+        
+        Args:
+            X: Array of shape (n_samples, n_features) in feature_order
+        """
+        if self.scaler is None:
+            if not self.scaling_features:
+                return
+            raise ValueError("Model was saved without a fitted scaler; retrain to use the numpy scoring path")
+        X[:, self._scale_idx] -= self._scale_mean
+        X[:, self._scale_idx] /= self._scale_std
+
+    def _predict_proba_array(self, X: np.ndarray) -> np.ndarray:
+        """
+        Fraud probabilities for a scaled feature array.
+        """
+        with warnings.catch_warnings():
+            # The model was fitted on a DataFrame; plain arrays carry no feature names
+            warnings.simplefilter('ignore', UserWarning)
+            return fast_predict_proba(self.model, X)[:, 1]
+
+    def _predict_labels(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predicted classes and fraud probabilities for a prepared feature matrix.
+        """
+        proba = fast_predict_proba(self.model, df)
+        if self.threshold is not None:
+            labels = self.model.classes_.take((proba[:, 1] >= self.threshold).astype(np.intp))
+        else:
+            labels = self.model.classes_.take(np.argmax(proba, axis=1))
+        return labels, proba[:, 1]
+
+    def _score_chunk(self, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Prepared features with a Prediction column, and the fraud
+        probabilities, for a chunk of raw transactions.
+        """
+        df = self._prepare_features(chunk)
+        df['Prediction'], proba = self._predict_labels(df)
+        return df, proba
+
+    def score_one(self, transaction: Dict[str, Any]) -> float:
+        """
+        Score a single transaction without going through pandas.
+        
+        The transaction is written into a preallocated row, so a Predictor
+        instance must not be shared between threads on this path.
+        
+        Args:
+            transaction: Mapping of feature name to raw value
+            
+        Returns:
+            float: Probability that the transaction is fraudulent
+        """
+        if self.model is None:
+            self.load_model()
+        
+        row = self._row
+        try:
+            for j, feature in enumerate(self.feature_order):
+                row[0, j] = transaction[feature]
+        except KeyError:
+            missing_features = [feat for feat in self.feature_order if feat not in transaction]
+            raise ValueError(f"Missing required features: {missing_features}")
+        
+        self._scale_array(row)
+        return float(self._predict_proba_array(row)[0])
+
+    def score_many(self, X: np.ndarray) -> np.ndarray:
+        """
+        Score a batch of transactions given as a raw numpy array.
+        
+        Args:
+            X: Array of shape (n_samples, n_features) with columns in feature_order
+            
+        Returns:
+            np.ndarray: Probability of fraud for each row
+        """
+        if self.model is None:
+            self.load_model()
+        
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        if X.shape[1] != len(self.feature_order):
+            raise ValueError(f"Expected {len(self.feature_order)} features, got {X.shape[1]}")
+        
+        self._scale_array(X)
+        return self._predict_proba_array(X)
+
+    def predict(self, input_file: Union[str, Path], output_file: Union[str, Path] = PREDICTION_OUTPUT,
+                chunk_size: Optional[int] = None, top_k: int = TOP_K_SUSPECTS,
+                workers: Optional[int] = None) -> None:
         """
         Make predictions on new transaction data and save results.
         
+        Afterwards, self.summary holds the row and alert counts and
+        self.top_suspects the top_k most suspicious input transactions
+        (see pipeline.topk), ranked as the rows are scored.
+        
         Args:
             input_file: Path to the input CSV file containing new transactions
             output_file: Path where predictions will be saved
+            chunk_size: If set, stream the input in chunks of this many rows
+                instead of loading the whole file into memory
+            top_k: Number of most suspicious transactions to keep
+            workers: If more than one, score the file in this many processes,
+                one shard of the file each (see pipeline.parallel_scoring)
         """
         # Load the model
         self.load_model()
         
-        # Load and preprocess new data
-        df = pd.read_csv(input_file)
-        
-        # Ensure feature order matches training data
-        required_features = ['Time', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6', 'V7', 'V8', 'V9', 'V10', 'V11', 'V12', 'V13', 'V14', 'V15', 'V16', 'V17', 'V18', 'V19', 'V20', 'V21', 'V22', 'V23', 'V24', 'V25', 'V26', 'V27', 'V28', 'Amount']
-        
-        # Check if all required features are present
-        missing_features = [feat for feat in required_features if feat not in df.columns]
-        if missing_features:
-            raise ValueError(f"Missing required features: {missing_features}")
+        if workers and workers > 1:
+            with stage('predict', source=str(input_file), workers=workers) as current:
+                current.rows = predict_parallel(self, input_file, output_file, workers,
+                                                chunk_size=chunk_size, top_k=top_k)
+            return
         
-        # Reorder columns to match training data
-        df = df[required_features]
+        ranker = TopKRanker(top_k)
+        if chunk_size:
+            with stage('predict', source=str(input_file), chunk_size=chunk_size) as current:
+                current.rows = self._predict_streaming(input_file, output_file, chunk_size, ranker)
+            self.top_suspects = ranker.result()
+            return
         
-        # Scale features
-        scaler = StandardScaler()
-        for feature in ['Amount', 'Time']:
-            df[feature] = scaler.fit_transform(df[[feature]])
+        # Load and preprocess new data
+        report = ParseReport()
+        with stage('read_input', source=str(input_file)) as current:
+            df = read_transactions(input_file, required=self.feature_order, report=report)
+            current.rows = len(df)
+        print(report.summary())
         
         # Make predictions
-        predictions = self.model.predict(df)
+        with stage('predict', rows=len(df)):
+            raw = df
+            df = self._prepare_features(df)
+            predictions, proba = self._predict_labels(df)
+            ranker.update(proba, raw, offsets=raw.index.to_numpy())
+        self.summary = {'rows': len(df), 'flagged': int(np.sum(predictions == 1))}
+        self.top_suspects = ranker.result()
         
         # Add predictions to original dataframe
         df['Prediction'] = predictions
@@ -60,3 +239,75 @@ class Predictor:
         # Save results
         df.to_csv(output_file, index=False)
         print(f"Predictions saved to {output_file}")
+
+    def _predict_streaming(self, input_file: Union[str, Path], output_file: Union[str, Path],
+                           chunk_size: int, ranker: Optional[TopKRanker] = None) -> int:
+        """
+        Read, score and append predictions one chunk at a time so peak memory
+        is bounded by the chunk size rather than the file size.
+        
+        Args:
+            input_file: Path to the input CSV file containing new transactions
+            output_file: Path where predictions will be saved
+            chunk_size: Number of rows per chunk
+            ranker: Optional ranker updated with every scored chunk
+        
+        Returns:
+            Number of rows scored
+        """
+        total_rows = 0
+        flagged = 0
+        report = ParseReport()
+        start = time.perf_counter()
+        chunk_start = start
+        
+        chunks = read_transactions(input_file, required=self.feature_order, chunksize=chunk_size, report=report)
+        for i, chunk in enumerate(chunks):
+            if chunk.empty:
+                continue
+            with stage('predict_chunk', rows=len(chunk), chunk=i):
+                df, proba = self._score_chunk(chunk)
+                if ranker is not None:
+                    ranker.update(proba, chunk, offsets=chunk.index.to_numpy())
+            flagged += int(np.sum(df['Prediction'].to_numpy() == 1))
+            first = total_rows == 0
+            df.to_csv(output_file, mode='w' if first else 'a', header=first, index=False)
+            
+            now = time.perf_counter()
+            elapsed = now - chunk_start
+            chunk_start = now
+            total_rows += len(df)
+            rate = len(df) / elapsed if elapsed > 0 else float('inf')
+            print(f"Chunk {i + 1}: {len(df)} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        
+        if total_rows == 0:
+            pd.DataFrame(columns=self.feature_order + ['Prediction']).to_csv(output_file, index=False)
+        
+        self.summary = {'rows': total_rows, 'flagged': flagged}
+        elapsed = time.perf_counter() - start
+        rate = total_rows / elapsed if elapsed > 0 else float('inf')
+        print(report.summary())
+        print(f"Scored {total_rows} transactions in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+        print(f"Predictions saved to {output_file}")
+        return total_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV file of transactions")
+    parser.add_argument("input_file", help="CSV file containing transactions to score")
+    parser.add_argument("--output", default=PREDICTION_OUTPUT, help="Where to write predictions")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help=f"Stream the input in chunks of this many rows (e.g. {PREDICTION_CHUNK_SIZE})")
+    parser.add_argument("--top-k", type=int, default=TOP_K_SUSPECTS,
+                        help="List this many of the most suspicious transactions")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Score the file in this many processes, one shard each")
+    args = parser.parse_args()
+    
+    predictor = Predictor()
+    predictor.predict(args.input_file, args.output, chunk_size=args.chunk_size, top_k=args.top_k,
+                      workers=args.workers)
+    print(f"\nTop {len(predictor.top_suspects)} most suspicious transactions (by row in the input file):")
+    print(predictor.top_suspects[['Time', 'Amount', 'Probability']].to_string())
+
+if __name__ == "__main__":
+    main()
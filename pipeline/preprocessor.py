@@ -3,6 +3,7 @@ from sklearn.model_selection import train_test_split
 from typing import Tuple
 import pandas as pd
 from config import TEST_SIZE, SCALING_FEATURES
+from utils.instrumentation import stage
 
 class Preprocessor:
     """
@@ -10,6 +11,7 @@ class Preprocessor:
     """
     def __init__(self):
         self.scaler = StandardScaler()
+        self.feature_order = None
 
     def fit_transform(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
         """
@@ -21,25 +23,45 @@ class Preprocessor:
         Returns:
             Tuple containing (X, y) where X is the feature matrix and y is the target vector
         """
-        # Scale selected features
-        for feature in SCALING_FEATURES:
-            df[feature] = self.scaler.fit_transform(df[[feature]])
+        with stage('preprocess', rows=len(df)):
+            # Scale selected features
+            df[SCALING_FEATURES] = self.scaler.fit_transform(df[SCALING_FEATURES])
 
-        # Split into features and target
-        X = df.drop('Class', axis=1)
-        y = df['Class']
+            # Split into features and target
+            X = df.drop('Class', axis=1)
+            y = df['Class']
+            self.feature_order = list(X.columns)
         
         return X, y
 
-    def split_data(self, X: pd.DataFrame, y: pd.Series) -> Tuple:
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply the scaling fitted by fit_transform to new data.
+        
+        Args:
+            df: Input DataFrame containing transaction data
+            
+        Returns:
+            pd.DataFrame: Feature matrix in training column order
+        """
+        if self.feature_order is None:
+            raise ValueError("Preprocessor not fitted yet")
+        
+        X = df[self.feature_order].copy()
+        X[SCALING_FEATURES] = self.scaler.transform(X[SCALING_FEATURES])
+        return X
+
+    def split_data(self, X: pd.DataFrame, y: pd.Series, test_size: float = TEST_SIZE) -> Tuple:
         """
         Split the data into training and testing sets.
         
         Args:
             X: Feature matrix
             y: Target vector
+            test_size: Share of the rows held out
             
         Returns:
             Tuple containing (X_train, X_test, y_train, y_test)
         """
-        return train_test_split(X, y, test_size=TEST_SIZE, random_state=42, stratify=y)
+        with stage('split', rows=len(y)):
+            return train_test_split(X, y, test_size=test_size, random_state=42, stratify=y)
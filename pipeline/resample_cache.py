@@ -0,0 +1,182 @@
+"""
+On-disk cache of resampled training sets.
+
+Entries are content-addressed: the key hashes the input data, the selected
+rows (e.g. a CV fold) and the sampler settings, so a repeated experiment on
+the same data loads the resampled set back instead of recomputing it.
+Arrays are stored one .npy per column, like the data cache, and loaded back
+memory-mapped; joblib passes memory-mapped arrays to worker processes by
+file name rather than by copy.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import RESAMPLE_CACHE_DIR, RESAMPLE_CACHE_MAX_BYTES
+
+_MANIFEST = 'manifest.json'
+
+def _update_array(digest, values: np.ndarray) -> None:
+    values = np.ascontiguousarray(values)
+    digest.update(f"{values.dtype.str}{values.shape}".encode('utf-8'))
+    digest.update(memoryview(values).cast('B'))
+
+def data_fingerprint(X, y) -> str:
+    """
+    Content hash of a feature matrix and its labels, including column names
+    and dtypes.
+
+    Args:
+        X: DataFrame or array of features
+        y: Series or array of labels
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(X, pd.DataFrame):
+        for col in X.columns:
+            digest.update(str(col).encode('utf-8'))
+            _update_array(digest, X[col].to_numpy())
+    else:
+        _update_array(digest, np.asarray(X))
+    _update_array(digest, np.asarray(y))
+    return digest.hexdigest()
+
+def cache_key(data_key: str, rows: Optional[np.ndarray], params: Dict[str, Any]) -> str:
+    """
+    Key of a resampled set: the input fingerprint, the selected rows (None
+    for all of them) and the sampler settings.
+    """
+    digest = hashlib.sha256(data_key.encode('utf-8'))
+    if rows is not None:
+        _update_array(digest, np.asarray(rows, dtype=np.int64))
+    digest.update(json.dumps(params, sort_keys=True, default=repr).encode('utf-8'))
+    return digest.hexdigest()
+
+class ResampleCache:
+    """
+    Directory of resampled training sets, pruned least recently used first
+    once it grows past max_bytes.
+    """
+    def __init__(self, cache_dir: str = RESAMPLE_CACHE_DIR, max_bytes: Optional[int] = RESAMPLE_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Directory holding one subdirectory per entry
+            max_bytes: Size limit of the cache, or None for no limit
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[Tuple[Any, Any]]:
+        """
+        Memory-mapped (X, y) stored under key, or None if there is no such entry.
+        """
+        entry_dir = self._entry_dir(key)
+        manifest_path = os.path.join(entry_dir, _MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            X, y = self._read(entry_dir, manifest)
+        except (OSError, ValueError, KeyError):
+            return None
+        # Mark as recently used for pruning
+        os.utime(manifest_path)
+        return X, y
+
+    @staticmethod
+    def _read(entry_dir: str, manifest: Dict[str, Any]) -> Tuple[Any, Any]:
+        def load(name):
+            return np.load(os.path.join(entry_dir, name), mmap_mode='r')
+
+        if manifest['columns'] is None:
+            X = load(manifest['files']['X'])
+        else:
+            X = pd.DataFrame({col: load(name) for col, name in zip(manifest['columns'], manifest['files']['columns'])},
+                             columns=manifest['columns'], copy=False)
+        y = load(manifest['files']['y'])
+        if manifest['y_series']:
+            y = pd.Series(y, name=manifest['y_name'], copy=False)
+        return X, y
+
+    def store(self, key: str, X, y, params: Dict[str, Any]) -> Tuple[Any, Any]:
+        """
+        Store a resampled set under key and return it memory-mapped from the cache.
+
+        The entry is written to a temporary directory and renamed into place,
+        so a partially written entry is never read.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            files: Dict[str, Any] = {'y': 'y.npy'}
+            if isinstance(X, pd.DataFrame):
+                columns = [str(col) for col in X.columns]
+                files['columns'] = [f"{i:04d}.npy" for i in range(len(columns))]
+                for col, name in zip(X.columns, files['columns']):
+                    np.save(os.path.join(tmp_dir, name), X[col].to_numpy())
+            else:
+                columns = None
+                files['X'] = 'X.npy'
+                np.save(os.path.join(tmp_dir, files['X']), np.asarray(X))
+            np.save(os.path.join(tmp_dir, files['y']), np.asarray(y))
+
+            manifest = {
+                'params': params,
+                'n_rows': len(y),
+                'columns': columns,
+                'y_series': isinstance(y, pd.Series),
+                'y_name': getattr(y, 'name', None),
+                'files': files,
+            }
+            with open(os.path.join(tmp_dir, _MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=2, default=repr)
+
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.prune(keep=key)
+        return self._read(entry_dir, manifest)
+
+    def prune(self, keep: Optional[str] = None) -> None:
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            keep: Key of an entry that is never removed
+        """
+        if self.max_bytes is None or not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            manifest_path = os.path.join(entry_dir, _MANIFEST)
+            if key.startswith('.') or not os.path.exists(manifest_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            entries.append((os.path.getmtime(manifest_path), key, size))
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Memory-mapped files stay readable after removal on POSIX
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
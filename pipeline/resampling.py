@@ -0,0 +1,231 @@
+"""
+Class-imbalance handling for training, as a configurable stage.
+
+Strategies:
+    smote            oversample frauds with SMOTE up to a balanced set (the original behaviour)
+    class_weight     no resampling; the model weights classes by inverse frequency
+    undersample      randomly drop legitimate transactions down to `ratio` frauds per legitimate one
+    smote_subsample  undersample to `ratio` first, then SMOTE up to balanced
+
+SMOTE's neighbour search only runs among the frauds, so its cost is mostly
+the larger training set that every later fit pays for; the subsampled
+variants shrink that set. Resampled sets are cached on disk (see
+pipeline.resample_cache), so repeated runs on the same data skip resampling.
+
+Compare the strategies on the training data:
+
+    python -m pipeline.resampling
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import imblearn
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline
+from imblearn.under_sampling import RandomUnderSampler
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from config import RESAMPLING_STRATEGY, RESAMPLING_RATIO, RESAMPLING_REPORT_PATH, RESAMPLE_CACHE_DIR
+from pipeline.data_loader import load_data
+from pipeline.preprocessor import Preprocessor
+from pipeline.resample_cache import ResampleCache, cache_key, data_fingerprint
+
+RESAMPLING_STRATEGIES = ('smote', 'class_weight', 'undersample', 'smote_subsample')
+
+class Resampler:
+    """
+    Rebalances a training set with the configured strategy and records what it cost.
+    """
+    def __init__(self, strategy: str = RESAMPLING_STRATEGY, ratio: float = RESAMPLING_RATIO,
+                 random_state: int = 42, cache_dir: Optional[str] = RESAMPLE_CACHE_DIR):
+        """
+        Args:
+            strategy: One of RESAMPLING_STRATEGIES
+            ratio: Frauds per legitimate transaction after undersampling
+                ('undersample' and 'smote_subsample')
+            random_state: Random seed
+            cache_dir: Where to cache resampled sets, or None to always resample
+        """
+        if strategy not in RESAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown resampling strategy: {strategy}")
+        self.strategy = strategy
+        self.ratio = ratio
+        self.random_state = random_state
+        self.cache = ResampleCache(cache_dir) if cache_dir is not None else None
+        self.report = None
+
+    @property
+    def class_weight(self) -> Optional[str]:
+        """class_weight for the model: 'balanced' when the data is not rebalanced"""
+        return 'balanced' if self.strategy == 'class_weight' else None
+
+    def _smote(self, n_fraud: int) -> Optional[SMOTE]:
+        # Small batches (e.g. a model refresh) have fewer frauds than SMOTE's default 5 neighbours
+        if n_fraud < 2:
+            return None
+        return SMOTE(random_state=self.random_state, k_neighbors=min(5, n_fraud - 1))
+
+    def _undersampler(self, y) -> Optional[RandomUnderSampler]:
+        counts = np.bincount(np.asarray(y, dtype=np.int64), minlength=2)
+        # Already at or above the requested ratio: nothing to drop
+        if counts[0] == 0 or counts[1] / counts[0] >= self.ratio:
+            return None
+        return RandomUnderSampler(sampling_strategy=self.ratio, random_state=self.random_state)
+
+    def samplers(self, y) -> List[Tuple[str, Any]]:
+        """
+        imblearn pipeline steps implementing the strategy for labels y (empty
+        for 'class_weight').
+        """
+        steps = []
+        if self.strategy in ('undersample', 'smote_subsample'):
+            undersampler = self._undersampler(y)
+            if undersampler is not None:
+                steps.append(('undersample', undersampler))
+        if self.strategy in ('smote', 'smote_subsample'):
+            smote = self._smote(int(np.sum(np.asarray(y) == 1)))
+            if smote is not None:
+                steps.append(('smote', smote))
+        return steps
+
+    @staticmethod
+    def _sampler_params(samplers: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        # Everything that determines the output, for the cache key
+        return {
+            'imblearn': imblearn.__version__,
+            'steps': [[name, type(sampler).__name__, sampler.get_params(deep=False)] for name, sampler in samplers],
+        }
+
+    def fit_resample(self, X, y, rows: Optional[np.ndarray] = None, data_key: Optional[str] = None):
+        """
+        Rebalance a training set, or load it from the cache if the same input
+        was resampled with the same settings before.
+
+        Args:
+            X: Training feature matrix
+            y: Training target vector
+            rows: Positions of the rows to resample (e.g. a CV training fold),
+                or None for all rows
+            data_key: data_fingerprint(X, y), when already computed for
+                several calls on the same data
+
+        Returns:
+            Tuple (X_resampled, y_resampled); memory-mapped from the cache when
+            caching is enabled. For 'class_weight', the (selected) inputs
+        """
+        start = time.perf_counter()
+        if rows is not None:
+            X_rows = X.iloc[rows] if hasattr(X, 'iloc') else X[rows]
+            y_rows = y.iloc[rows] if hasattr(y, 'iloc') else y[rows]
+        else:
+            X_rows, y_rows = X, y
+        samplers = self.samplers(y_rows)
+
+        cached = False
+        key = None
+        if samplers and self.cache is not None:
+            params = self._sampler_params(samplers)
+            key = cache_key(data_key or data_fingerprint(X, y), rows, params)
+            loaded = self.cache.load(key)
+            if loaded is not None:
+                X_resampled, y_resampled = loaded
+                cached = True
+
+        if not cached:
+            X_resampled, y_resampled = X_rows, y_rows
+            for _, sampler in samplers:
+                X_resampled, y_resampled = sampler.fit_resample(X_resampled, y_resampled)
+            if key is not None:
+                try:
+                    X_resampled, y_resampled = self.cache.store(key, X_resampled, y_resampled, params)
+                except OSError as e:
+                    print(f"Could not cache resampled data: {e}")
+
+        self.report = {
+            'strategy': self.strategy,
+            'ratio': self.ratio if self.strategy in ('undersample', 'smote_subsample') else None,
+            'resample_seconds': time.perf_counter() - start,
+            'cached': cached,
+            'rows_in': len(y_rows),
+            'rows_out': len(y_resampled),
+            'fraud_rows_out': int(np.sum(np.asarray(y_resampled) == 1)),
+        }
+        return X_resampled, y_resampled
+
+    def pipeline(self, model, y) -> Pipeline:
+        """
+        imblearn Pipeline resampling with this strategy before fitting model.
+        Samplers only run during fit, never when predicting.
+        """
+        return Pipeline(self.samplers(y) + [('model', model)])
+
+def compare_strategies(X_train, y_train, X_test, y_test, strategies: Sequence[str] = RESAMPLING_STRATEGIES,
+                       ratio: float = RESAMPLING_RATIO, n_estimators: int = 100,
+                       cache_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Train the same random forest after each strategy and report the cost of
+    resampling and training against the test metrics.
+
+    Args:
+        X_train, y_train: Training data
+        X_test, y_test: Held-out data
+        strategies: Strategies to compare
+        ratio: Undersampling ratio for the subsampling strategies
+        n_estimators: Trees in the comparison forest
+        cache_dir: Resample cache to use; by default every strategy is
+            resampled afresh so its cost is measured
+
+    Returns:
+        One record per strategy
+    """
+    results = []
+    for strategy in strategies:
+        resampler = Resampler(strategy, ratio=ratio, cache_dir=cache_dir)
+        X_resampled, y_resampled = resampler.fit_resample(X_train, y_train)
+
+        start = time.perf_counter()
+        model = RandomForestClassifier(n_estimators=n_estimators, class_weight=resampler.class_weight,
+                                       random_state=42, n_jobs=-1)
+        model.fit(X_resampled, y_resampled)
+        fit_seconds = time.perf_counter() - start
+
+        y_proba = model.predict_proba(X_test)[:, 1]
+        y_pred = (y_proba >= 0.5).astype(int)
+        record = dict(resampler.report)
+        record.update({
+            'fit_seconds': fit_seconds,
+            'precision': precision_score(y_test, y_pred, zero_division=0),
+            'recall': recall_score(y_test, y_pred),
+            'f1_score': f1_score(y_test, y_pred),
+            'roc_auc': roc_auc_score(y_test, y_proba),
+        })
+        results.append(record)
+        print(f"{strategy:<16}{record['rows_out']:>10}{record['resample_seconds']:>12.2f}"
+              f"{fit_seconds:>10.2f}{record['f1_score']:>8.4f}{record['roc_auc']:>9.4f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare class-imbalance strategies")
+    parser.add_argument("--data", default="data/creditcard.csv", help="Labelled transaction CSV")
+    parser.add_argument("--strategies", nargs='+', choices=RESAMPLING_STRATEGIES, default=list(RESAMPLING_STRATEGIES))
+    parser.add_argument("--ratio", type=float, default=RESAMPLING_RATIO,
+                        help="Frauds per legitimate transaction after undersampling")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--output", default=RESAMPLING_REPORT_PATH, help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    df = load_data(args.data)
+    preprocessor = Preprocessor()
+    X, y = preprocessor.fit_transform(df)
+    X_train, X_test, y_train, y_test = preprocessor.split_data(X, y)
+
+    print(f"{'strategy':<16}{'rows':>10}{'resample s':>12}{'fit s':>10}{'f1':>8}{'roc_auc':>9}")
+    results = compare_strategies(X_train, y_train, X_test, y_test, args.strategies, args.ratio, args.n_estimators)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, default=float)
+    print(f"Resampling report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Local scoring daemon with asyncio micro-batching.
+
+Concurrent single-transaction requests are gathered into micro-batches for at
+most --max-wait-ms and scored with one vectorized call. Runs entirely offline:
+
+    python -m pipeline.scoring_service --port 8765
+    python -m pipeline.scoring_service --unix-socket /tmp/fraud.sock --model ensemble
+
+Endpoints (HTTP/1.1, JSON):
+    POST /score    one transaction {"Time": ..., "V1": ..., "Amount": ...}
+    GET  /metrics  latency percentiles and batch-size histogram
+    GET  /health   liveness check
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from config import (ENSEMBLE_MODEL_PATH, SERVICE_HOST, SERVICE_PORT, SERVICE_MAX_WAIT_MS,
+                    SERVICE_MAX_BATCH)
+from pipeline.ensemble_trainer import EnsembleTrainer
+from pipeline.model_registry import default_registry
+from pipeline.predictor import Predictor
+from pipeline.schema import FEATURE_COLUMNS
+from utils.logger import Logger
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+class ServiceMetrics:
+    """
+    Request latencies and batch sizes of the scoring service.
+    """
+    def __init__(self, window: int = 100000):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.batches = 0
+
+    def record_batch(self, size: int, latencies: List[float]) -> None:
+        self.batches += 1
+        self.requests += size
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        self.batch_sizes[1 << (size - 1).bit_length()] += 1
+        self.latencies.extend(latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies_ms = np.array(self.latencies) * 1e3
+        percentiles = {}
+        if len(latencies_ms):
+            p50, p99 = np.percentile(latencies_ms, [50, 99])
+            percentiles = {'p50': float(p50), 'p99': float(p99), 'max': float(latencies_ms.max())}
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'latency_ms': percentiles,
+            'batch_size_histogram': {f"<={size}": count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+class MicroBatcher:
+    """
+    Collects single rows submitted concurrently and scores them in batches.
+    
+    A batch is closed when it reaches max_batch rows or max_wait seconds after
+    its first row arrived. Scoring runs on a single worker thread, so the
+    event loop keeps accepting requests while a batch is being scored.
+    """
+    def __init__(self, score_batch: Callable[[np.ndarray], np.ndarray], max_wait: float, max_batch: int,
+                 metrics: Optional[ServiceMetrics] = None):
+        self.score_batch = score_batch
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.metrics = metrics or ServiceMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, row: np.ndarray) -> float:
+        """
+        Score one row of raw features; resolves once its batch is scored.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            X = np.stack([row for row, _, _ in batch])
+            try:
+                probabilities = await loop.run_in_executor(self._executor, self.score_batch, X)
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch[0][1], e)
+                    continue
+                # Rescore the rows one at a time so only the request that broke the batch fails
+                probabilities = []
+                for row, future, _ in batch:
+                    try:
+                        probability = await loop.run_in_executor(self._executor, self.score_batch, row[None, :])
+                    except Exception as e:
+                        self._fail(future, e)
+                        probability = None
+                    else:
+                        probability = probability[0]
+                    probabilities.append(probability)
+            
+            now = time.perf_counter()
+            scored = [(item, probability) for item, probability in zip(batch, probabilities)
+                      if probability is not None]
+            for (_, future, arrived), probability in scored:
+                if not future.done():
+                    future.set_result(float(probability))
+            if scored:
+                self.metrics.record_batch(len(scored), [now - arrived for (_, _, arrived), _ in scored])
+
+    @staticmethod
+    def _fail(future: asyncio.Future, error: Exception) -> None:
+        if not future.done():
+            future.set_exception(error)
+
+def make_scorer(model: str) -> Tuple[Callable[[np.ndarray], np.ndarray], Callable[[], Optional[float]]]:
+    """
+    Batch scoring function over raw feature rows in FEATURE_COLUMNS order.
+    
+    Args:
+        model: 'predictor' for the single model artifact (scaled with its
+            bundled scaler), or 'ensemble' for the saved EnsembleTrainer
+            
+    Returns:
+        tuple: Function mapping an (n, n_features) array to fraud
+        probabilities, and a function returning the decision threshold saved
+        with the model last used for scoring (None if it has none)
+    """
+    if model == 'predictor':
+        predictor = Predictor()
+        predictor.load_model()
+        if predictor.feature_order != FEATURE_COLUMNS:
+            raise ValueError("Model feature order does not match the transaction schema")
+        
+        def score(X: np.ndarray) -> np.ndarray:
+            # Cheap when unchanged; picks up a retrained model between batches
+            predictor.load_model()
+            return predictor.score_many(X)
+        return score, lambda: predictor.threshold
+    
+    if model == 'ensemble':
+        ensemble = default_registry.get(ENSEMBLE_MODEL_PATH, loader=EnsembleTrainer.load)
+        
+        def score(X: np.ndarray) -> np.ndarray:
+            nonlocal ensemble
+            ensemble = default_registry.get(ENSEMBLE_MODEL_PATH, loader=EnsembleTrainer.load)
+            return ensemble.predict_proba(X)
+        return score, lambda: getattr(ensemble, 'threshold', 0.5)
+    
+    raise ValueError(f"Unknown model: {model}")
+
+class ScoringService:
+    """
+    Minimal HTTP/1.1 front end for the micro-batcher, served over TCP and/or
+    a Unix domain socket.
+    """
+    def __init__(self, batcher: MicroBatcher, threshold: Callable[[], Optional[float]] = lambda: 0.5):
+        """
+        Args:
+            batcher: Micro-batcher that scores the requests
+            threshold: Returns the current model's decision threshold
+                (None predicts the most probable class)
+        """
+        self.batcher = batcher
+        self.threshold = threshold
+        self.logger = Logger('scoring_service').get_logger()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path == '/score':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}
+            try:
+                transaction = json.loads(body)
+                row = np.array([transaction[feature] for feature in FEATURE_COLUMNS], dtype=np.float64)
+            except KeyError as e:
+                return 400, {'error': f"Missing required feature: {e.args[0]}"}
+            except (ValueError, TypeError) as e:
+                return 400, {'error': f"Invalid transaction: {e}"}
+            if not np.isfinite(row).all():
+                # json.loads accepts NaN and Infinity, which the models cannot score
+                bad = [feature for feature, value in zip(FEATURE_COLUMNS, row) if not np.isfinite(value)]
+                return 400, {'error': f"Non-finite values for features: {bad}"}
+            try:
+                probability = await self.batcher.submit(row)
+            except Exception as e:
+                self.logger.error(f"Scoring failed: {e}")
+                return 500, {'error': str(e)}
+            self.logger.debug("Scored transaction: probability=%.6f", probability)
+            threshold = self.threshold()
+            # Without a tuned threshold, the most probable class (a tie is legitimate)
+            flagged = probability >= threshold if threshold is not None else probability > 0.5
+            return 200, {'probability': probability, 'prediction': int(flagged)}
+        if path == '/metrics':
+            return 200, self.batcher.metrics.snapshot()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        return 404, {'error': f"Unknown path: {path}"}
+
+async def serve(args: argparse.Namespace) -> None:
+    score, threshold = make_scorer(args.model)
+    batcher = MicroBatcher(score, args.max_wait_ms / 1000.0, args.max_batch)
+    batcher.start()
+    service = ScoringService(batcher, threshold)
+    
+    servers = []
+    if args.port:
+        servers.append(await asyncio.start_server(service.handle_connection, args.host, args.port))
+        service.logger.info(f"Listening on http://{args.host}:{args.port}")
+    if args.unix_socket:
+        servers.append(await asyncio.start_unix_server(service.handle_connection, args.unix_socket))
+        service.logger.info(f"Listening on unix socket {args.unix_socket}")
+    
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        await batcher.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fraud scoring service with micro-batching")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="TCP port (0 to disable)")
+    parser.add_argument("--unix-socket", help="Also listen on this Unix domain socket")
+    parser.add_argument("--model", choices=['predictor', 'ensemble'], default='predictor')
+    parser.add_argument("--max-wait-ms", type=float, default=SERVICE_MAX_WAIT_MS,
+                        help="Longest time a request waits for its batch to fill")
+    parser.add_argument("--max-batch", type=int, default=SERVICE_MAX_BATCH)
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
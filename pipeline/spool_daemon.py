@@ -0,0 +1,353 @@
+"""
+Watch-folder batch scoring daemon.
+
+Payment terminals drop transaction CSVs into a spool directory. The daemon
+scans it, and scores every new file in a process pool whose workers load
+the model once (and reload it only when the file on disk changes):
+
+    python -m pipeline.spool_daemon data/spool --workers 4
+    python -m pipeline.spool_daemon data/spool --once      # score what is there and exit
+
+Each input `name.csv` gets `name.scored.csv` next to it (the input columns
+plus Probability and Prediction), written to a temporary file and renamed
+into place so a reader never sees a partial result. Every finished file is
+appended to a journal (SPOOL_JOURNAL in the spool directory), keyed by name,
+size and modification time, so a restarted daemon never rescores a file;
+a file that is replaced with new content is scored again.
+
+If a worker process dies (e.g. killed for running out of memory), the pool
+is recreated and the files it was scoring are retried one at a time, so the
+next crash can be pinned on a single file. A file whose worker crashes
+SPOOL_MAX_CRASHES times is journalled as failed and the spool moves on.
+"""
+import argparse
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from config import (ENSEMBLE_MODEL_PATH, SPOOL_DIR, SPOOL_POLL_INTERVAL, SPOOL_SETTLE_SECONDS, SPOOL_WORKERS,
+                    SPOOL_MAX_CRASHES, SPOOL_RESULT_SUFFIX, SPOOL_JOURNAL)
+from pipeline.ensemble_trainer import EnsembleTrainer
+from pipeline.model_registry import default_registry
+from pipeline.predictor import Predictor
+from pipeline.schema import FEATURE_COLUMNS, ParseReport, read_transactions
+from utils.logger import Logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so run one daemon per directory
+    fcntl = None
+
+# (file name, size, modification time): a file is scored once per version
+FileKey = Tuple[str, int, int]
+
+# Per worker process: the model kind, and the Predictor loaded by _init_worker
+_worker_model: Optional[str] = None
+_worker_predictor: Optional[Predictor] = None
+
+def _init_worker(model: str, worker: bool = True) -> None:
+    """Process pool initializer: load the model once per worker process"""
+    global _worker_model, _worker_predictor
+    if worker:
+        # The daemon handles Ctrl-C and waits for the files being scored
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker_model = model
+    if model == 'predictor':
+        _worker_predictor = Predictor()
+        _worker_predictor.load_model()
+    else:
+        default_registry.get(ENSEMBLE_MODEL_PATH, loader=EnsembleTrainer.load)
+
+def _score(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Fraud probabilities and labels for raw transactions"""
+    if _worker_model == 'predictor':
+        # Cheap when unchanged; picks up a retrained model between files
+        _worker_predictor.load_model()
+        proba = _worker_predictor.score_many(df[_worker_predictor.feature_order].to_numpy(dtype=np.float64))
+        threshold = _worker_predictor.threshold
+    else:
+        ensemble = default_registry.get(ENSEMBLE_MODEL_PATH, loader=EnsembleTrainer.load)
+        proba = ensemble.predict_proba(df[FEATURE_COLUMNS])
+        threshold = getattr(ensemble, 'threshold', 0.5)
+    # Without a tuned threshold, the most probable class (a tie is legitimate)
+    flagged = proba >= threshold if threshold is not None else proba > 0.5
+    return proba, flagged.astype(np.int8)
+
+def score_file(input_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    Score one spooled file in a worker process and write its results atomically.
+
+    Args:
+        input_path: Transaction CSV
+        output_path: Where to write the input columns plus Probability and Prediction
+
+    Returns:
+        dict: Row, rejected-row and alert counts and the scoring time
+    """
+    start = time.perf_counter()
+    report = ParseReport()
+    df = read_transactions(input_path, required=FEATURE_COLUMNS, report=report)
+    proba, flagged = _score(df)
+    df['Probability'] = proba
+    df['Prediction'] = flagged
+
+    directory, name = os.path.split(output_path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {
+        'rows': len(df),
+        'rejected': report.rejected,
+        'flagged': int(flagged.sum()),
+        'seconds': time.perf_counter() - start,
+    }
+
+class Journal:
+    """
+    Append-only JSONL record of the files already processed.
+
+    Only the daemon process writes it. While open, it holds an exclusive lock
+    (where the platform supports it), so two daemons cannot share a spool
+    directory.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[FileKey] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; that file is scored again
+                        continue
+                    self.done.add((record['file'], record['size'], record['mtime_ns']))
+        self._file = open(path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                raise RuntimeError(f"Another spool daemon is already using {os.path.dirname(path) or '.'}")
+
+    def __contains__(self, key: FileKey) -> bool:
+        return key in self.done
+
+    def record(self, key: FileKey, **fields) -> None:
+        """Append a processed file; flushed, but synced to disk only by sync()"""
+        name, size, mtime_ns = key
+        entry = {'file': name, 'size': size, 'mtime_ns': mtime_ns, **fields,
+                 'finished_at': datetime.now().isoformat(timespec='milliseconds')}
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        self.done.add(key)
+
+    def sync(self) -> None:
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+class SpoolDaemon:
+    """
+    Scores the transaction files that appear in a directory.
+    """
+    def __init__(self, spool_dir: str = SPOOL_DIR, workers: Optional[int] = SPOOL_WORKERS,
+                 model: str = 'predictor', poll_interval: float = SPOOL_POLL_INTERVAL,
+                 settle_seconds: float = SPOOL_SETTLE_SECONDS, max_crashes: int = SPOOL_MAX_CRASHES):
+        """
+        Args:
+            spool_dir: Directory to watch
+            workers: Scoring processes (default: one per CPU)
+            model: 'predictor' for the single model artifact, or 'ensemble'
+            poll_interval: Seconds between directory scans
+            settle_seconds: Only files unmodified for this long are picked up,
+                so files still being written are left alone (0 when terminals
+                move finished files into the directory atomically)
+            max_crashes: Worker crashes after which a file is journalled as failed
+        """
+        if model not in ('predictor', 'ensemble'):
+            raise ValueError(f"Unknown model: {model}")
+        self.spool_dir = spool_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.model = model
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.max_crashes = max_crashes
+        self.logger = Logger('spool_daemon').get_logger()
+        self.stats = {'scored': 0, 'failed': 0, 'rows': 0}
+        self._stopping = False
+
+    def stop(self, *_args) -> None:
+        """Finish the files being scored, then exit"""
+        self._stopping = True
+
+    @staticmethod
+    def is_input(name: str) -> bool:
+        return (name.lower().endswith('.csv') and not name.startswith('.')
+                and not name.endswith(SPOOL_RESULT_SUFFIX))
+
+    def output_path(self, name: str) -> str:
+        return os.path.join(self.spool_dir, name[:-len('.csv')] + SPOOL_RESULT_SUFFIX)
+
+    def scan(self, journal: Journal, in_flight: Set[FileKey]) -> List[Tuple[FileKey, str]]:
+        """
+        New input files that are not being written any more, oldest first.
+        """
+        settled_before = time.time_ns() - int(self.settle_seconds * 1e9)
+        found = []
+        with os.scandir(self.spool_dir) as entries:
+            for entry in entries:
+                if not self.is_input(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                key = (entry.name, stat.st_size, stat.st_mtime_ns)
+                if key in journal or key in in_flight or stat.st_mtime_ns > settled_before:
+                    continue
+                found.append((key, entry.path))
+        found.sort(key=lambda item: item[0][2])
+        return found
+
+    def run(self, once: bool = False) -> Dict[str, int]:
+        """
+        Watch the spool directory until stopped (SIGINT/SIGTERM).
+
+        Args:
+            once: Score the files present now, then return
+
+        Returns:
+            dict: Files scored and failed, and rows scored
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Load the model here first, so a missing model fails at start-up rather
+        # than as a broken pool; forked workers also start with it in memory
+        _init_worker(self.model, worker=False)
+        journal = Journal(os.path.join(self.spool_dir, SPOOL_JOURNAL))
+        if not once:
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        self.logger.info(f"Watching {self.spool_dir} with {self.workers} workers "
+                         f"({len(journal.done)} files already processed)")
+
+        pending: Dict[Future, Tuple[FileKey, str]] = {}
+        # Worker crashes per file still being retried
+        crashes: Dict[FileKey, int] = {}
+        try:
+            while True:
+                try:
+                    self._process(journal, pending, crashes, once)
+                    break
+                except BrokenProcessPool:
+                    self._record_crash(journal, pending, crashes)
+        except KeyboardInterrupt:
+            self.logger.info("Interrupted; files being scored will be picked up again on restart")
+        finally:
+            journal.close()
+        self.logger.info(f"Stopped: {self.stats['scored']} files ({self.stats['rows']} rows) scored, "
+                         f"{self.stats['failed']} failed")
+        return dict(self.stats)
+
+    def _process(self, journal: Journal, pending: Dict[Future, Tuple[FileKey, str]],
+                 crashes: Dict[FileKey, int], once: bool) -> None:
+        """Score files in a new process pool until done; raises BrokenProcessPool if a worker dies"""
+        # Enough queued work to keep every worker busy between scans
+        max_pending = 4 * self.workers
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.model,)) as pool:
+            while True:
+                # A file that was being scored when a worker crashed runs alone
+                isolated = any(key in crashes for key, _ in pending.values())
+                if not self._stopping and not isolated:
+                    in_flight = {key for key, _ in pending.values()}
+                    for key, path in self.scan(journal, in_flight)[:max_pending - len(pending)]:
+                        if key in crashes and pending:
+                            break
+                        future = pool.submit(score_file, path, self.output_path(key[0]))
+                        pending[future] = (key, path)
+                        if key in crashes:
+                            break
+
+                if not pending:
+                    if once or self._stopping:
+                        return
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, _ = pending[future]
+                    self._record(journal, key, future)
+                    del pending[future]
+                    crashes.pop(key, None)
+                if done:
+                    journal.sync()
+
+    def _record_crash(self, journal: Journal, pending: Dict[Future, Tuple[FileKey, str]],
+                      crashes: Dict[FileKey, int]) -> None:
+        """Count a worker crash against every file that was in the broken pool"""
+        for key, _ in pending.values():
+            crashes[key] = crashes.get(key, 0) + 1
+            if crashes[key] >= self.max_crashes:
+                # Recorded so the file cannot stall the spool; replacing it retries it
+                self.stats['failed'] += 1
+                self.logger.error(f"Could not score {key[0]}: its worker crashed {crashes.pop(key)} times")
+                journal.record(key, status='failed', error='worker process crashed')
+            else:
+                self.logger.warning(f"A worker crashed while {key[0]} was queued; retrying it alone")
+        pending.clear()
+        journal.sync()
+
+    def _record(self, journal: Journal, key: FileKey, future: Future) -> None:
+        name = key[0]
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # Handled by run(), which recreates the pool and retries the files
+            raise
+        except Exception as e:
+            # Recorded so a bad file is not retried forever; replacing it retries it
+            self.stats['failed'] += 1
+            self.logger.error(f"Could not score {name}: {e}")
+            journal.record(key, status='failed', error=str(e))
+            return
+        self.stats['scored'] += 1
+        self.stats['rows'] += result['rows']
+        output = os.path.basename(self.output_path(name))
+        journal.record(key, status='scored', output=output, **result)
+        self.logger.info(f"Scored {name}: {result['rows']} rows, {result['flagged']} flagged "
+                         f"in {result['seconds'] * 1e3:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score transaction files dropped into a spool directory")
+    parser.add_argument("spool_dir", nargs='?', default=SPOOL_DIR, help="Directory to watch")
+    parser.add_argument("--workers", type=int, default=SPOOL_WORKERS,
+                        help="Scoring processes (default: one per CPU)")
+    parser.add_argument("--model", choices=['predictor', 'ensemble'], default='predictor')
+    parser.add_argument("--poll-interval", type=float, default=SPOOL_POLL_INTERVAL,
+                        help="Seconds between directory scans")
+    parser.add_argument("--settle-seconds", type=float, default=SPOOL_SETTLE_SECONDS,
+                        help="Ignore files modified more recently than this (0 if files are moved in atomically)")
+    parser.add_argument("--once", action="store_true", help="Score the files present now and exit")
+    args = parser.parse_args()
+
+    daemon = SpoolDaemon(args.spool_dir, workers=args.workers, model=args.model,
+                         poll_interval=args.poll_interval, settle_seconds=args.settle_seconds)
+    daemon.run(once=args.once)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Out-of-core training: streams a transaction CSV in chunks through models that
+can be fitted incrementally, so the dataset never has to fit in memory.
+
+    python -m pipeline.streaming_trainer data/creditcard.csv --model sgd
+    python -m pipeline.streaming_trainer data/creditcard.csv --model forest --chunk-size 200000
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from config import (MODEL_PATH, METRICS_PATH, STREAMING_CHUNK_SIZE, STREAMING_HOLDOUT_FRACTION,
+                    STREAMING_NEGATIVE_RATIO, STREAMING_REPORT_PATH)
+from pipeline.evaluator import metrics_from_counts
+from pipeline.model_artifact import build_artifact, save_artifact
+from pipeline.schema import FEATURE_COLUMNS, LABEL_COLUMN, ParseReport, read_transactions
+from utils.instrumentation import stage
+
+MODEL_TYPES = ('sgd', 'nb', 'forest')
+CLASSES = np.array([0, 1])
+
+def holdout_mask(row_ids: np.ndarray, fraction: float) -> np.ndarray:
+    """
+    Deterministic holdout assignment from a multiplicative hash of the row
+    position in the file, so every pass (and every run) agrees on the split
+    without shuffling the data.
+
+    Args:
+        row_ids: Zero-based row positions in the file
+        fraction: Fraction of rows to hold out
+
+    Returns:
+        Boolean mask, True for holdout rows
+    """
+    hashed = (row_ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    return hashed < np.uint64(int(fraction * 2 ** 24))
+
+class StreamingTrainer:
+    """
+    Trains a fraud model chunk by chunk from a CSV file.
+
+    Three passes are made over the file: the first fits the scaler and counts
+    the classes of the training rows, the second trains on them, and the third
+    scores the holdout rows. Instead of global SMOTE, each chunk is rebalanced
+    by keeping every fraud and a random sample of legitimate transactions,
+    sized so about negative_ratio of them are kept per fraud overall.
+    """
+    def __init__(self, model_type: str = 'sgd', chunk_size: int = STREAMING_CHUNK_SIZE,
+                 holdout_fraction: float = STREAMING_HOLDOUT_FRACTION,
+                 negative_ratio: float = STREAMING_NEGATIVE_RATIO, trees_per_batch: int = 10,
+                 min_batch_rows: int = 1000, random_state: int = 42):
+        """
+        Args:
+            model_type: 'sgd' (logistic regression by SGD), 'nb' (Gaussian naive
+                Bayes) or 'forest' (random forest grown by trees_per_batch trees
+                per batch of rebalanced rows)
+            chunk_size: Rows read from the CSV at a time
+            holdout_fraction: Fraction of rows held out for evaluation
+            negative_ratio: Legitimate transactions kept per fraud
+            trees_per_batch: Trees added per training batch ('forest' only)
+            min_batch_rows: Rebalanced rows are buffered until a batch has at
+                least this many rows and both classes
+            random_state: Random seed
+        """
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown model type: {model_type}")
+        self.model_type = model_type
+        self.chunk_size = chunk_size
+        self.holdout_fraction = holdout_fraction
+        self.negative_ratio = negative_ratio
+        self.trees_per_batch = trees_per_batch
+        self.min_batch_rows = min_batch_rows
+        self.random_state = random_state
+        self.scaler = None
+        self.estimator = None
+        self.model = None
+        self.report = None
+
+    def _create_estimator(self):
+        if self.model_type == 'sgd':
+            return SGDClassifier(loss='log_loss', alpha=1e-4, random_state=self.random_state)
+        if self.model_type == 'nb':
+            return GaussianNB()
+        return RandomForestClassifier(n_estimators=0, warm_start=True, n_jobs=-1,
+                                      random_state=self.random_state)
+
+    def _chunks(self, input_file: Union[str, Path],
+                report: Optional[ParseReport] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Yield (features, labels, holdout mask) for each chunk of the file.
+        """
+        chunks = read_transactions(input_file, columns=FEATURE_COLUMNS + [LABEL_COLUMN],
+                                   required=FEATURE_COLUMNS + [LABEL_COLUMN],
+                                   chunksize=self.chunk_size, report=report)
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            # The index holds row positions in the file, so every pass sees the same split
+            holdout = holdout_mask(chunk.index.to_numpy(), self.holdout_fraction)
+            X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+            y = chunk[LABEL_COLUMN].to_numpy()
+            yield X, y, holdout
+
+    def _partial_fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        if self.model_type == 'forest':
+            # warm_start keeps the fitted trees and grows only the new ones on this batch
+            self.estimator.n_estimators += self.trees_per_batch
+            self.estimator.fit(X, y)
+        else:
+            self.estimator.partial_fit(X, y, classes=CLASSES)
+
+    def train(self, input_file: Union[str, Path]) -> None:
+        """
+        Train the scaler and model on the non-holdout rows of a CSV file.
+
+        Args:
+            input_file: Transaction CSV with FEATURE_COLUMNS and the Class label
+        """
+        start = time.perf_counter()
+
+        # Pass 1: scaler statistics and class counts
+        print("Pass 1: fitting scaler and counting classes...")
+        self.scaler = StandardScaler()
+        counts = np.zeros(2, dtype=np.int64)
+        report = ParseReport()
+        with stage('streaming_scan', source=str(input_file)) as current:
+            for X, y, holdout in self._chunks(input_file, report):
+                train = ~holdout
+                if train.any():
+                    self.scaler.partial_fit(X[train])
+                    counts += np.bincount(y[train], minlength=2)[:2]
+            current.rows = report.rows
+        print(report.summary())
+        n_negative, n_positive = int(counts[0]), int(counts[1])
+        if n_positive == 0 or n_negative == 0:
+            raise ValueError("Training rows must contain both fraudulent and legitimate transactions")
+        keep_negative = min(1.0, self.negative_ratio * n_positive / n_negative)
+        print(f"Training rows: {n_negative + n_positive} ({n_positive} fraud); "
+              f"keeping {keep_negative:.2%} of legitimate transactions")
+
+        # Pass 2: rebalance each chunk and fit incrementally
+        print(f"Pass 2: training {self.model_type} model...")
+        self.estimator = self._create_estimator()
+        rng = np.random.default_rng(self.random_state)
+        buffer_X: List[np.ndarray] = []
+        buffer_y: List[np.ndarray] = []
+        n_buffered = 0
+        n_batches = 0
+        n_used = np.zeros(2, dtype=np.int64)
+        with stage('streaming_fit', model=self.model_type) as current:
+            for X, y, holdout in self._chunks(input_file):
+                keep = ~holdout & ((y == 1) | (rng.random(len(y)) < keep_negative))
+                if not keep.any():
+                    continue
+                buffer_X.append(self.scaler.transform(X[keep]))
+                buffer_y.append(y[keep])
+                n_buffered += int(keep.sum())
+
+                batch_y = np.concatenate(buffer_y) if len(buffer_y) > 1 else buffer_y[0]
+                if n_buffered < self.min_batch_rows or len(np.unique(batch_y)) < 2:
+                    continue
+                self._partial_fit(np.vstack(buffer_X), batch_y)
+                n_used += np.bincount(batch_y, minlength=2)[:2]
+                n_batches += 1
+                buffer_X, buffer_y, n_buffered = [], [], 0
+
+            # Leftover rows; a forest batch needs both classes
+            if buffer_y:
+                batch_y = np.concatenate(buffer_y)
+                if self.model_type != 'forest' or len(np.unique(batch_y)) == 2:
+                    self._partial_fit(np.vstack(buffer_X), batch_y)
+                    n_used += np.bincount(batch_y, minlength=2)[:2]
+                    n_batches += 1
+            current.rows = int(n_used.sum())
+        if n_batches == 0:
+            raise ValueError("No training batch contained both classes; lower min_batch_rows")
+
+        self.model = Pipeline([('scaler', self.scaler), ('model', self.estimator)])
+        elapsed = time.perf_counter() - start
+        print(f"Trained on {int(n_used.sum())} rebalanced rows ({int(n_used[1])} fraud) "
+              f"in {n_batches} batches, {elapsed:.1f}s")
+
+        self.report = {
+            'model_type': self.model_type,
+            'input_file': str(input_file),
+            'chunk_size': self.chunk_size,
+            'holdout_fraction': self.holdout_fraction,
+            'negative_ratio': self.negative_ratio,
+            'training_rows': n_negative + n_positive,
+            'training_fraud_rows': n_positive,
+            'rebalanced_rows': int(n_used.sum()),
+            'batches': n_batches,
+            'train_seconds': elapsed,
+        }
+
+    def evaluate(self, input_file: Union[str, Path]) -> Dict[str, Any]:
+        """
+        Score the holdout rows of a CSV file chunk by chunk.
+
+        Args:
+            input_file: The file passed to train()
+
+        Returns:
+            dict: The metrics reported by Evaluator.evaluate
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet")
+
+        print("Pass 3: scoring holdout rows...")
+        counts = np.zeros(4, dtype=np.int64)
+        with stage('streaming_evaluate') as current:
+            for X, y, holdout in self._chunks(input_file):
+                if not holdout.any():
+                    continue
+                y_true = y[holdout].astype(np.int64)
+                y_pred = self.model.predict(X[holdout]).astype(np.int64)
+                counts += np.bincount(2 * y_true + y_pred, minlength=4)[:4]
+            current.rows = int(counts.sum())
+        tn, fp, fn, tp = (int(c) for c in counts)
+        metrics = metrics_from_counts(tn, fp, fn, tp)
+        if self.report is not None:
+            self.report['holdout_rows'] = int(counts.sum())
+            self.report['metrics'] = metrics
+        return metrics
+
+    def compare_to_baseline(self, metrics: Dict[str, Any], path: str = METRICS_PATH) -> Optional[Dict[str, Any]]:
+        """
+        Compare holdout metrics with those saved by the in-memory training run (main.py).
+
+        The baseline is measured on its own stratified test split, so the
+        comparison is indicative rather than row-for-row.
+
+        Args:
+            metrics: Metrics returned by evaluate
+            path: Metrics saved by main.py
+
+        Returns:
+            Per-metric streaming value, baseline value and difference, or None
+            if no baseline has been saved
+        """
+        if not os.path.exists(path):
+            print(f"No in-memory baseline at {path}; run main.py to create one")
+            return None
+        with open(path) as f:
+            baseline = json.load(f)
+
+        comparison = {}
+        print(f"\n{'metric':<12}{'streaming':>12}{'in-memory':>12}{'diff':>10}")
+        for name, value in metrics.items():
+            if name == 'confusion_matrix' or name not in baseline:
+                continue
+            comparison[name] = {'streaming': value, 'in_memory': baseline[name], 'diff': value - baseline[name]}
+            print(f"{name:<12}{value:>12.4f}{baseline[name]:>12.4f}{value - baseline[name]:>+10.4f}")
+        if self.report is not None:
+            self.report['baseline'] = comparison
+        return comparison
+
+    def save_model(self, path: str = MODEL_PATH) -> None:
+        """
+        Save the scaler + model Pipeline as a model artifact. The Pipeline
+        scales its own inputs, so no separate scaler is stored.
+
+        Args:
+            path: Destination path
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet")
+        artifact = build_artifact(self.model, scaler=None, scaling_features=[],
+                                  feature_order=FEATURE_COLUMNS, training='streaming',
+                                  model_type=self.model_type)
+        save_artifact(artifact, path)
+        print(f"Model saved to {path}")
+
+    def save_report(self, path: str = STREAMING_REPORT_PATH) -> None:
+        """
+        Save the training summary, holdout metrics and baseline comparison as JSON.
+
+        Args:
+            path: Destination path
+        """
+        if self.report is None:
+            raise ValueError("Model not trained yet")
+        with open(path, 'w') as f:
+            json.dump(self.report, f, indent=2, default=float)
+        print(f"Streaming training report saved to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a fraud model out of core from a CSV file")
+    parser.add_argument("input_file", help="Transaction CSV including the Class label")
+    parser.add_argument("--model", choices=MODEL_TYPES, default='sgd', help="Incrementally trained model")
+    parser.add_argument("--chunk-size", type=int, default=STREAMING_CHUNK_SIZE, help="Rows read at a time")
+    parser.add_argument("--holdout", type=float, default=STREAMING_HOLDOUT_FRACTION,
+                        help="Fraction of rows held out for evaluation")
+    parser.add_argument("--negative-ratio", type=float, default=STREAMING_NEGATIVE_RATIO,
+                        help="Legitimate transactions kept per fraud when rebalancing")
+    parser.add_argument("--output", default=MODEL_PATH, help="Where to save the model")
+    parser.add_argument("--baseline", default=METRICS_PATH, help="Metrics saved by main.py to compare against")
+    args = parser.parse_args()
+
+    trainer = StreamingTrainer(args.model, chunk_size=args.chunk_size, holdout_fraction=args.holdout,
+                               negative_ratio=args.negative_ratio)
+    trainer.train(args.input_file)
+    metrics = trainer.evaluate(args.input_file)
+    print("\nHoldout metrics:")
+    for metric, value in metrics.items():
+        if isinstance(value, list):
+            print(f"{metric}:\n{value}")
+        else:
+            print(f"{metric}: {value:.4f}")
+    trainer.compare_to_baseline(metrics, args.baseline)
+    trainer.save_model(args.output)
+    trainer.save_report()
+
+if __name__ == "__main__":
+    main()
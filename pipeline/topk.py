@@ -0,0 +1,112 @@
+"""
+Streaming top-K ranking of the most suspicious transactions.
+
+Each chunk's K best rows are found with a partial selection (argpartition,
+O(n)) and merged with the K kept so far, so ranking a file of any size
+needs memory for K rows only, instead of a full sort of every probability.
+"""
+from typing import Optional
+import numpy as np
+import pandas as pd
+from config import TOP_K_SUSPECTS
+
+def top_k_indices(scores: np.ndarray, offsets: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, in no particular order. Ties at the
+    cut-off go to the smallest offsets, so the result does not depend on how
+    the input was split into chunks. NaN scores are never selected.
+
+    Args:
+        scores: Scores of the candidates
+        offsets: Original row offsets of the candidates (unique)
+        k: Number of positions to return
+
+    Returns:
+        Array of at most k positions into scores
+    """
+    valid = ~np.isnan(scores)
+    if not valid.all():
+        positions = np.flatnonzero(valid)
+        return positions[top_k_indices(scores[positions], offsets[positions], k)]
+    n = len(scores)
+    if n <= k:
+        return np.arange(n)
+    cutoff = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > cutoff)
+    tied = np.flatnonzero(scores == cutoff)
+    needed = k - len(above)
+    if len(tied) > needed:
+        tied = tied[np.argpartition(offsets[tied], needed - 1)[:needed]]
+    return np.concatenate([above, tied])
+
+class TopKRanker:
+    """
+    Keeps the k highest-scoring rows seen over a stream of scored chunks,
+    with their original row offsets.
+    """
+    def __init__(self, k: int = TOP_K_SUSPECTS):
+        """
+        Args:
+            k: Number of rows to keep
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        self.rows_seen = 0
+        self.scores = np.empty(0, dtype=np.float64)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.rows: Optional[pd.DataFrame] = None
+
+    def update(self, scores: np.ndarray, rows: Optional[pd.DataFrame] = None,
+               offsets: Optional[np.ndarray] = None) -> None:
+        """
+        Merge a scored chunk into the ranking.
+
+        Args:
+            scores: Score of each row in the chunk (e.g. fraud probability)
+            rows: Optional rows of the chunk to keep alongside the scores
+                (e.g. the raw transactions)
+            offsets: Original row offsets of the chunk; by default rows are
+                numbered consecutively across updates
+        """
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        if offsets is None:
+            offsets = np.arange(self.rows_seen, self.rows_seen + len(scores), dtype=np.int64)
+        else:
+            offsets = np.asarray(offsets, dtype=np.int64)
+        if len(offsets) != len(scores) or (rows is not None and len(rows) != len(scores)):
+            raise ValueError("scores, rows and offsets must have the same length")
+        if self.rows_seen and (rows is None) != (self.rows is None):
+            raise ValueError("Pass rows with every update or with none")
+        self.rows_seen += len(scores)
+
+        # The chunk's own top k first, so the merge below only sees 2k candidates
+        best = top_k_indices(scores, offsets, self.k)
+        scores = np.concatenate([self.scores, scores[best]])
+        offsets = np.concatenate([self.offsets, offsets[best]])
+        if rows is not None:
+            chunk_rows = rows.iloc[best]
+            rows = chunk_rows if self.rows is None else pd.concat([self.rows, chunk_rows])
+
+        keep = top_k_indices(scores, offsets, self.k)
+        self.scores = scores[keep]
+        self.offsets = offsets[keep]
+        if rows is not None:
+            self.rows = rows.iloc[keep]
+
+    def result(self) -> pd.DataFrame:
+        """
+        The kept rows, most suspicious first (ties in offset order).
+
+        Returns:
+            DataFrame indexed by original row offset ('Row'), with the kept
+            row columns, if any, and a 'Probability' column holding the score
+        """
+        order = np.lexsort((self.offsets, -self.scores))
+        if self.rows is not None:
+            result = self.rows.iloc[order].copy()
+        else:
+            result = pd.DataFrame(index=np.arange(len(order)))
+        result.index = pd.Index(self.offsets[order], name='Row')
+        result['Probability'] = self.scores[order]
+        return result
@@ -1,24 +1,87 @@
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV
-from imblearn.over_sampling import SMOTE
-from joblib import dump
-from typing import Tuple, Dict, Any
+from sklearn.model_selection import GridSearchCV, ParameterGrid, StratifiedKFold
+from sklearn.metrics import f1_score
+from joblib import Parallel, delayed
+from typing import Tuple, Dict, Any, List, Optional
+import json
+import math
+import time
+from datetime import datetime
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from config import MODEL_PATH
+from config import (MODEL_PATH, SCALING_FEATURES, TUNING_STRATEGY, TUNING_TIME_BUDGET,
+                    TUNING_MAX_FITS, TUNING_HALVING_FACTOR, TUNING_CV_FOLDS, TUNING_REPORT_PATH,
+                    REFRESH_NEW_TREES, REFRESH_MAX_TREES, RESAMPLING_STRATEGY)
+from pipeline.model_artifact import build_artifact, load_artifact, save_versioned_artifact
+from pipeline.preprocessor import Preprocessor
+from pipeline.resampling import Resampler
+from pipeline.schema import LABEL_COLUMN
+from utils.instrumentation import instrumentation, stage, worker_timer, worker_timing
+
+PARAM_GRID = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [None, 10, 20],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4]
+}
+
+def _take(data, idx: np.ndarray):
+    return data.iloc[idx] if hasattr(data, 'iloc') else data[idx]
+
+def _fit_and_score(params: Dict[str, Any], X, y, train: np.ndarray, test: np.ndarray,
+                   class_weight: Optional[str] = None) -> Tuple[float, Dict[str, Any]]:
+    """
+    Fit a forest on one CV split and return its F1 score and the timing of the fit.
+    """
+    started = worker_timer()
+    model = RandomForestClassifier(**params, class_weight=class_weight, random_state=42, n_jobs=1)
+    model.fit(_take(X, train), _take(y, train))
+    timing = worker_timing(started)
+    return f1_score(_take(y, test), model.predict(_take(X, test))), timing
 
 class Trainer:
     """
     Class for training the fraud detection model with hyperparameter tuning.
     """
-    def __init__(self):
+    def __init__(self, tuning_strategy: str = TUNING_STRATEGY, time_budget: Optional[float] = TUNING_TIME_BUDGET,
+                 max_fits: Optional[int] = TUNING_MAX_FITS, resampling: str = RESAMPLING_STRATEGY):
+        """
+        Args:
+            tuning_strategy: 'halving' for budgeted successive halving, or 'grid'
+                for the exhaustive GridSearchCV over PARAM_GRID
+            time_budget: Wall-clock budget in seconds for successive halving
+            max_fits: Maximum number of forest fits for successive halving
+            resampling: Class-imbalance strategy (see pipeline.resampling)
+        """
+        if tuning_strategy not in ('halving', 'grid'):
+            raise ValueError(f"Unknown tuning strategy: {tuning_strategy}")
+        self.tuning_strategy = tuning_strategy
+        self.time_budget = time_budget
+        self.max_fits = max_fits
+        self.resampler = Resampler(resampling)
         self.model = None
         self.best_params = None
         self.feature_importances = None
+        self.tuning_report = None
 
     def _perform_hyperparameter_tuning(self, X_train: pd.DataFrame, y_train: pd.Series) -> Dict[str, Any]:
+        """
+        Perform hyperparameter tuning with the configured strategy.
+        
+        Args:
+            X_train: Training feature matrix
+            y_train: Training target vector
+            
+        Returns:
+            Dictionary of best hyperparameters
+        """
+        if self.tuning_strategy == 'halving':
+            return self._successive_halving(X_train, y_train)
+        return self._grid_search(X_train, y_train)
+
+    def _grid_search(self, X_train: pd.DataFrame, y_train: pd.Series) -> Dict[str, Any]:
         """
         Perform hyperparameter tuning using GridSearchCV.
         
@@ -29,54 +92,198 @@ class Trainer:
         Returns:
             Dictionary of best hyperparameters
         """
-        param_grid = {
-            'n_estimators': [100, 200, 300],
-            'max_depth': [None, 10, 20],
-            'min_samples_split': [2, 5, 10],
-            'min_samples_leaf': [1, 2, 4]
-        }
+        start = time.perf_counter()
 
         # Create base model
-        base_model = RandomForestClassifier(random_state=42, n_jobs=-1)
+        base_model = RandomForestClassifier(class_weight=self.resampler.class_weight, random_state=42, n_jobs=-1)
         
         # Perform grid search
         grid_search = GridSearchCV(
             estimator=base_model,
-            param_grid=param_grid,
-            cv=3,
+            param_grid=PARAM_GRID,
+            cv=TUNING_CV_FOLDS,
             scoring='f1',
             n_jobs=-1,
             verbose=1
         )
         
-        grid_search.fit(X_train, y_train)
+        with stage('grid_search', rows=len(y_train), candidates=len(ParameterGrid(PARAM_GRID))):
+            grid_search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
+
+        results = grid_search.cv_results_
+        candidates = [
+            {'rung': 0, 'params': params, 'n_rows': len(y_train), 'score': float(score),
+             'fit_time': float(fit_time * TUNING_CV_FOLDS)}
+            for params, score, fit_time in zip(results['params'], results['mean_test_score'], results['mean_fit_time'])
+        ]
+        self.tuning_report = self._build_report(
+            candidates,
+            [{'rung': 0, 'n_candidates': len(candidates), 'n_rows': len(y_train), 'elapsed': elapsed,
+              'best_score': float(grid_search.best_score_)}],
+            grid_search.best_params_, float(grid_search.best_score_), elapsed
+        )
         return grid_search.best_params_
 
+    def _successive_halving(self, X_train: pd.DataFrame, y_train: pd.Series) -> Dict[str, Any]:
+        """
+        Perform hyperparameter tuning by successive halving.
+        
+        Every candidate in PARAM_GRID is first scored on a small stratified
+        subsample with a scaled-down number of trees. After each rung only the
+        best 1/TUNING_HALVING_FACTOR of the candidates go on, and they get
+        TUNING_HALVING_FACTOR times more rows and trees. The first rung always
+        runs; after that, tuning stops early and keeps the best candidate of the
+        last completed rung when the next rung would exceed the time or fit budget.
+        
+        Args:
+            X_train: Training feature matrix
+            y_train: Training target vector
+            
+        Returns:
+            Dictionary of best hyperparameters
+        """
+        start = time.perf_counter()
+        eta = TUNING_HALVING_FACTOR
+        candidates = list(ParameterGrid(PARAM_GRID))
+        n_rungs = 1
+        while eta ** n_rungs < len(candidates):
+            n_rungs += 1
+        y_array = np.asarray(y_train)
+
+        # One stratified ordering of the rows: each row is placed by its relative
+        # position within its own class, so every prefix keeps the class ratio.
+        # Rungs use growing prefixes, so larger rungs contain the smaller ones.
+        permutation = np.random.RandomState(42).permutation(len(y_array))
+        position = np.empty(len(y_array))
+        for label in np.unique(y_array):
+            members = permutation[y_array[permutation] == label]
+            position[members] = (np.arange(len(members)) + 0.5) / len(members)
+        order = np.argsort(position, kind='stable')
+
+        records: List[Dict[str, Any]] = []
+        rungs: List[Dict[str, Any]] = []
+        n_fits = 0
+        last_rung_time = None
+        best_params, best_score = candidates[0], float('-inf')
+
+        for rung in range(n_rungs):
+            # The last rung still uses a fraction of the data; the winner is refit in full
+            scale = eta ** (rung - n_rungs)
+            n_rows = min(len(y_array), max(int(len(y_array) * scale), 100 * TUNING_CV_FOLDS))
+            fits = len(candidates) * TUNING_CV_FOLDS
+            elapsed = time.perf_counter() - start
+
+            # Stop when the next rung would not fit in the budget
+            if rungs and self.max_fits is not None and n_fits + fits > self.max_fits:
+                break
+            if rungs and self.time_budget is not None and elapsed + last_rung_time * eta > self.time_budget:
+                break
+
+            rung_start = time.perf_counter()
+            rows = np.sort(order[:n_rows])
+            X_rung, y_rung = _take(X_train, rows), _take(y_train, rows)
+            cv = StratifiedKFold(n_splits=TUNING_CV_FOLDS, shuffle=True, random_state=42)
+            splits = list(cv.split(np.zeros(n_rows), np.asarray(y_rung)))
+            rung_params = [
+                dict(params, n_estimators=max(10, int(math.ceil(params['n_estimators'] * scale))))
+                for params in candidates
+            ]
+
+            with stage('tuning_rung', rows=n_rows, rung=rung, candidates=len(candidates)):
+                results = Parallel(n_jobs=-1)(
+                    delayed(_fit_and_score)(params, X_rung, y_rung, train, test, self.resampler.class_weight)
+                    for params in rung_params for train, test in splits
+                )
+            n_fits += fits
+
+            scores = []
+            for i, params in enumerate(candidates):
+                fold_results = results[i * TUNING_CV_FOLDS:(i + 1) * TUNING_CV_FOLDS]
+                score = float(np.mean([r[0] for r in fold_results]))
+                scores.append(score)
+                records.append({'rung': rung, 'params': params, 'n_rows': n_rows,
+                                'n_estimators': rung_params[i]['n_estimators'], 'score': score,
+                                'fit_time': float(sum(r[1]['wall'] for r in fold_results))})
+                for fold, ((fold_score, timing), (train, _)) in enumerate(zip(fold_results, splits)):
+                    instrumentation.record('tuning_fit', rows=len(train), rung=rung, candidate=i, fold=fold,
+                                           score=fold_score, **timing)
+
+            ranking = np.argsort(-np.array(scores), kind='stable')
+            best_params, best_score = candidates[ranking[0]], scores[ranking[0]]
+            last_rung_time = time.perf_counter() - rung_start
+            rungs.append({'rung': rung, 'n_candidates': len(candidates), 'n_rows': n_rows,
+                          'elapsed': time.perf_counter() - start, 'best_score': best_score})
+            print(f"Rung {rung}: {len(candidates)} candidates on {n_rows} rows, "
+                  f"best F1 {best_score:.4f} ({last_rung_time:.1f}s)")
+
+            candidates = [candidates[i] for i in ranking[:max(1, len(candidates) // eta)]]
+
+        self.tuning_report = self._build_report(records, rungs, best_params, best_score,
+                                                time.perf_counter() - start)
+        return best_params
+
+    def _build_report(self, candidates: List[Dict[str, Any]], rungs: List[Dict[str, Any]],
+                      best_params: Dict[str, Any], best_score: float, total_time: float) -> Dict[str, Any]:
+        return {
+            'strategy': self.tuning_strategy,
+            'time_budget': self.time_budget,
+            'max_fits': self.max_fits,
+            'total_time': total_time,
+            'n_fits': sum(r['n_candidates'] for r in rungs) * TUNING_CV_FOLDS,
+            'best_params': best_params,
+            'best_score': best_score,
+            'rungs': rungs,
+            'candidates': candidates,
+        }
+
+    def save_tuning_report(self, path: str = TUNING_REPORT_PATH) -> None:
+        """
+        Save the time-versus-score report of the last hyperparameter search as JSON.
+        
+        Args:
+            path: Destination path
+        """
+        if self.tuning_report is None:
+            raise ValueError("Model not trained yet")
+        
+        with open(path, 'w') as f:
+            json.dump(self.tuning_report, f, indent=2, default=str)
+        print(f"Tuning report saved to {path}")
+
     def train(self, X_train: pd.DataFrame, y_train: pd.Series) -> None:
         """
-        Train the model with hyperparameter tuning and SMOTE.
+        Train the model with hyperparameter tuning, handling class imbalance
+        with the configured resampling strategy (SMOTE by default).
         
         Args:
             X_train: Training feature matrix
             y_train: Training target vector
         """
-        # Handle imbalanced data using SMOTE
-        smote = SMOTE(random_state=42)
-        X_resampled, y_resampled = smote.fit_resample(X_train, y_train)
+        # Handle imbalanced data
+        with stage('resample', rows=len(y_train), strategy=self.resampler.strategy):
+            X_resampled, y_resampled = self.resampler.fit_resample(X_train, y_train)
+        report = self.resampler.report
+        print(f"Resampled with {report['strategy']}: {report['rows_in']} -> {report['rows_out']} rows "
+              f"({report['fraud_rows_out']} fraud) in {report['resample_seconds']:.1f}s"
+              f"{' (from cache)' if report['cached'] else ''}")
 
         # Perform hyperparameter tuning
         print("\nPerforming hyperparameter tuning...")
-        self.best_params = self._perform_hyperparameter_tuning(X_resampled, y_resampled)
+        with stage('tuning', rows=len(y_resampled), strategy=self.tuning_strategy):
+            self.best_params = self._perform_hyperparameter_tuning(X_resampled, y_resampled)
         print(f"Best parameters found: {self.best_params}")
 
         # Train model with best parameters
         self.model = RandomForestClassifier(
             **self.best_params,
+            class_weight=self.resampler.class_weight,
             random_state=42,
             n_jobs=-1
         )
         
-        self.model.fit(X_resampled, y_resampled)
+        with stage('fit_final', rows=len(y_resampled)):
+            self.model.fit(X_resampled, y_resampled)
         
         # Get feature importances
         self.feature_importances = pd.DataFrame({
@@ -84,16 +291,119 @@ class Trainer:
             'importance': self.model.feature_importances_
         }).sort_values('importance', ascending=False)
 
-    def save_model(self) -> None:
+    def save_model(self, preprocessor: Optional[Preprocessor] = None, threshold: Optional[float] = None) -> None:
         """
-        Save the trained model and feature importances to disk.
+        Save the trained model to disk, bundled with the fitted preprocessing.
+        
+        Args:
+            preprocessor: Preprocessor fitted on the training data. Its scaler and
+                feature order are stored with the model so predictions reuse them.
+            threshold: Decision threshold on the fraud probability to store with
+                the model (e.g. from Evaluator.threshold_sweep); None keeps 0.5
         """
         if self.model is None:
             raise ValueError("Model not trained yet")
         
         # Save model
-        dump(self.model, MODEL_PATH)
-        print(f"Model saved to {MODEL_PATH}")
+        trained_at = datetime.now().isoformat(timespec='seconds')
+        if preprocessor is not None:
+            artifact = build_artifact(
+                self.model,
+                scaler=preprocessor.scaler,
+                scaling_features=SCALING_FEATURES,
+                feature_order=preprocessor.feature_order,
+                trained_at=trained_at,
+                threshold=threshold,
+                resampling=self.resampler.strategy
+            )
+        else:
+            artifact = build_artifact(self.model, trained_at=trained_at, threshold=threshold,
+                                      resampling=self.resampler.strategy)
+        version = save_versioned_artifact(artifact, MODEL_PATH)
+        print(f"Model saved to {MODEL_PATH} (version {version})")
+
+    def refresh(self, df: pd.DataFrame, n_new_trees: int = REFRESH_NEW_TREES,
+                max_trees: Optional[int] = REFRESH_MAX_TREES, path: str = MODEL_PATH) -> Dict[str, Any]:
+        """
+        Update the saved forest with a newly labelled batch, without retuning.
+        
+        New trees are grown on the batch (warm start, after the resampling
+        the model was trained with)
+        with the saved model's hyperparameters, and the oldest trees are
+        retired. The result is saved as a new model version.
+        
+        Args:
+            df: Raw labelled transactions, with the Class column
+            n_new_trees: Trees to grow on the batch
+            max_trees: Forest size after retiring the oldest trees (default:
+                the size before the refresh)
+            path: Path of the current model
+            
+        Returns:
+            dict: Summary of the refresh
+        """
+        start = time.perf_counter()
+        artifact = load_artifact(path)
+        model = artifact['model']
+        if not isinstance(model, RandomForestClassifier):
+            raise ValueError(f"Only random forest models can be refreshed, got {type(model).__name__}")
+        if LABEL_COLUMN not in df.columns:
+            raise ValueError(f"The new batch has no {LABEL_COLUMN} column")
+        y = df[LABEL_COLUMN]
+        if y.nunique() < 2:
+            raise ValueError("The new batch must contain both fraudulent and legitimate transactions")
+        
+        # Preprocess with the saved scaler; refitting it would shift the inputs of the old trees
+        feature_order = artifact['feature_order'] or [col for col in df.columns if col != LABEL_COLUMN]
+        X = df[feature_order].copy()
+        if artifact['scaler'] is not None:
+            scaling_features = artifact['scaling_features']
+            X[scaling_features] = artifact['scaler'].transform(X[scaling_features])
+        
+        # Handle imbalanced data the way the model was trained
+        n_fraud = int((y == 1).sum())
+        X, y = Resampler(artifact.get('resampling', 'smote'), cache_dir=None).fit_resample(X, y)
+        
+        n_old = len(model.estimators_)
+        max_trees = max_trees or n_old
+        tree_added_at = artifact.get('tree_added_at') or [artifact.get('trained_at')] * n_old
+        
+        with stage('refresh', rows=len(y), new_trees=n_new_trees):
+            model.set_params(warm_start=True, n_estimators=n_old + n_new_trees)
+            model.fit(X, y)
+            model.set_params(warm_start=False)
+        refreshed_at = datetime.now().isoformat(timespec='seconds')
+        tree_added_at = tree_added_at + [refreshed_at] * n_new_trees
+        
+        # Trees are appended in training order, so the oldest come first
+        n_retired = max(0, len(model.estimators_) - max_trees)
+        if n_retired:
+            model.estimators_ = model.estimators_[n_retired:]
+            model.n_estimators = len(model.estimators_)
+            tree_added_at = tree_added_at[n_retired:]
+        
+        artifact.update({
+            'parent_version': artifact.get('version'),
+            'refreshed_at': refreshed_at,
+            'refresh_rows': len(df),
+            'tree_added_at': tree_added_at,
+        })
+        version = save_versioned_artifact(artifact, path)
+        self.model = model
+        
+        summary = {
+            'version': version,
+            'parent_version': artifact['parent_version'],
+            'rows': len(df),
+            'fraud_rows': n_fraud,
+            'trees_added': n_new_trees,
+            'trees_retired': n_retired,
+            'n_trees': len(model.estimators_),
+            'seconds': time.perf_counter() - start,
+        }
+        print(f"Added {n_new_trees} trees and retired {n_retired} in {summary['seconds']:.1f}s; "
+              f"model saved to {path} (version {version})")
+        return summary
 
     def plot_feature_importance(self, n_features: int = 10) -> None:
         """
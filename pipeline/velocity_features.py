@@ -0,0 +1,206 @@
+"""
+Velocity features: transaction count, amount sum and maximum amount in
+trailing time windows ending at each transaction.
+
+The window of a transaction at time t covers the transactions with time in
+(t - window, t] that come no later than it in time order (ties keep their
+input order), itself included. compute_velocity_features evaluates this for a
+whole batch with vectorized numpy; VelocityState maintains the same windows
+incrementally for scoring one transaction at a time.
+"""
+from collections import deque
+from typing import Deque, List, Sequence, Tuple
+import numpy as np
+from config import VELOCITY_WINDOWS
+
+def window_label(seconds: int) -> str:
+    """Short label for a window length, e.g. 60 -> '1m', 3600 -> '1h'"""
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+def velocity_feature_names(windows: Sequence[int] = VELOCITY_WINDOWS) -> List[str]:
+    """Column names of the velocity features, in output order"""
+    names = []
+    for seconds in windows:
+        label = window_label(seconds)
+        names += [f'TxCount_{label}', f'AmountSum_{label}', f'AmountMax_{label}']
+    return names
+
+VELOCITY_FEATURES = velocity_feature_names()
+
+def _range_max(values: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    max(values[left[i]:right[i] + 1]) for every i, from a sparse table of
+    maxima over power-of-two spans.
+    """
+    lengths = right - left + 1
+    levels = int(lengths.max()).bit_length()
+    table = [values]
+    for level in range(1, levels):
+        span = 1 << (level - 1)
+        previous = table[-1]
+        table.append(np.maximum(previous[:-span], previous[span:]))
+    # Each range is covered by two (possibly overlapping) spans of 2**level
+    level = np.floor(np.log2(lengths)).astype(np.intp)
+    result = np.empty(len(values), dtype=values.dtype)
+    for k in range(levels):
+        rows = np.flatnonzero(level == k)
+        if len(rows):
+            result[rows] = np.maximum(table[k][left[rows]], table[k][right[rows] - (1 << k) + 1])
+    return result
+
+def _sorted_velocity(times: np.ndarray, amounts: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    n = len(times)
+    out = np.empty((n, 3 * len(windows)), dtype=np.float64)
+    if n == 0:
+        return out
+    position = np.arange(n)
+    cumulative = np.concatenate(([0.0], np.cumsum(amounts)))
+    for j, seconds in enumerate(windows):
+        # First row inside (t - window, t]; every earlier row has time <= t - window
+        left = np.searchsorted(times, times - seconds, side='right')
+        out[:, 3 * j] = position - left + 1
+        out[:, 3 * j + 1] = cumulative[position + 1] - cumulative[left]
+        out[:, 3 * j + 2] = _range_max(amounts, left, position)
+    return out
+
+def compute_velocity_features(times: np.ndarray, amounts: np.ndarray,
+                              windows: Sequence[int] = VELOCITY_WINDOWS) -> np.ndarray:
+    """
+    Velocity features for a batch of transactions, in input order.
+
+    Args:
+        times: Transaction times in seconds (the Time column)
+        amounts: Transaction amounts
+        windows: Trailing window lengths in seconds
+
+    Returns:
+        Array of shape (n, 3 * len(windows)) with columns in
+        velocity_feature_names(windows) order
+    """
+    times = np.asarray(times, dtype=np.float64)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if len(times) > 1 and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        out = np.empty((len(times), 3 * len(windows)), dtype=np.float64)
+        out[order] = _sorted_velocity(times[order], amounts[order], windows)
+        return out
+    return _sorted_velocity(times, amounts, windows)
+
+class _Window:
+    """Transactions inside one trailing window, with their running sum and maximum"""
+    __slots__ = ('seconds', 'items', 'total', 'maxima')
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.items: Deque[Tuple[float, float]] = deque()
+        self.total = 0.0
+        # Decreasing amounts; the front is the window maximum
+        self.maxima: Deque[Tuple[float, float]] = deque()
+
+    def push(self, time: float, amount: float) -> None:
+        self.items.append((time, amount))
+        self.total += amount
+        while self.maxima and self.maxima[-1][1] <= amount:
+            self.maxima.pop()
+        self.maxima.append((time, amount))
+        cutoff = time - self.seconds
+        while self.items[0][0] <= cutoff:
+            self.total -= self.items.popleft()[1]
+        while self.maxima[0][0] <= cutoff:
+            self.maxima.popleft()
+
+    def reset(self, times: np.ndarray, amounts: np.ndarray) -> None:
+        keep = times > times[-1] - self.seconds if len(times) else np.zeros(0, dtype=bool)
+        times, amounts = times[keep], amounts[keep]
+        self.items = deque(zip(times.tolist(), amounts.tolist()))
+        self.total = float(amounts.sum())
+        # An amount stays a candidate maximum while no later amount is at least as large
+        later_max = np.maximum.accumulate(amounts[::-1])[::-1]
+        candidate = np.ones(len(amounts), dtype=bool)
+        candidate[:-1] = amounts[:-1] > later_max[1:]
+        self.maxima = deque(zip(times[candidate].tolist(), amounts[candidate].tolist()))
+
+class VelocityState:
+    """
+    Incrementally maintained velocity windows for scoring a live stream.
+
+    Transactions must arrive in time order (equal times are fine). Memory is
+    bounded by the number of transactions in the longest window.
+    """
+    def __init__(self, windows: Sequence[int] = VELOCITY_WINDOWS):
+        """
+        Args:
+            windows: Trailing window lengths in seconds
+        """
+        self.windows = list(windows)
+        self.feature_names = velocity_feature_names(self.windows)
+        self._windows = [_Window(seconds) for seconds in self.windows]
+        self.last_time = -np.inf
+
+    def update(self, time: float, amount: float) -> np.ndarray:
+        """
+        Add one transaction and return its velocity features.
+
+        Args:
+            time: Transaction time in seconds
+            amount: Transaction amount
+
+        Returns:
+            Array of 3 * len(windows) features in feature_names order
+        """
+        time, amount = float(time), float(amount)
+        if time < self.last_time:
+            raise ValueError(f"Transaction at {time} arrived after one at {self.last_time}")
+        self.last_time = time
+        out = np.empty(3 * len(self._windows), dtype=np.float64)
+        for j, window in enumerate(self._windows):
+            window.push(time, amount)
+            out[3 * j] = len(window.items)
+            out[3 * j + 1] = window.total
+            out[3 * j + 2] = window.maxima[0][1]
+        return out
+
+    def update_batch(self, times: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """
+        Add a batch of transactions and return their velocity features.
+
+        The batch may be unsorted, but may not go back before the last
+        transaction already seen. The features are computed vectorized over
+        the retained history plus the batch.
+
+        Args:
+            times: Transaction times in seconds
+            amounts: Transaction amounts
+
+        Returns:
+            Array of shape (n, 3 * len(windows)), in input order
+        """
+        times = np.asarray(times, dtype=np.float64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if len(times) == 0:
+            return np.empty((0, 3 * len(self.windows)), dtype=np.float64)
+        order = np.argsort(times, kind='stable')
+        times, amounts = times[order], amounts[order]
+        if times[0] < self.last_time:
+            raise ValueError(f"Batch starts at {times[0]}, before the last transaction at {self.last_time}")
+
+        # The longest window holds every transaction any window still needs
+        history = max(self._windows, key=lambda window: window.seconds).items
+        n_history = len(history)
+        if n_history:
+            past = np.array(history, dtype=np.float64)
+            times = np.concatenate([past[:, 0], times])
+            amounts = np.concatenate([past[:, 1], amounts])
+        features = _sorted_velocity(times, amounts, self.windows)[n_history:]
+
+        for window in self._windows:
+            window.reset(times, amounts)
+        self.last_time = float(times[-1])
+
+        out = np.empty_like(features)
+        out[order] = features
+        return out
@@ -0,0 +1,33 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from config import COMPILED_FOREST_MAX_BATCH
+from pipeline.compiled_forest import fast_predict_proba
+
+def test_fast_predict_proba_matches_sklearn():
+    # Small forest on data with fraud-like imbalance
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 8))
+    y = (X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.normal(scale=0.5, size=len(X)) > 2.0).astype(int)
+    model = RandomForestClassifier(n_estimators=20, random_state=42).fit(X, y)
+
+    # One row, a batch for the compiled engine, and a batch sklearn scores itself
+    for n_rows in (1, COMPILED_FOREST_MAX_BATCH - 1, COMPILED_FOREST_MAX_BATCH + 1):
+        batch = X[:n_rows]
+        assert np.allclose(fast_predict_proba(model, batch), model.predict_proba(batch)), n_rows
+
+    # Rows exactly on the split thresholds must take the same branch as in sklearn
+    tree = model.estimators_[0].tree_
+    splits = np.flatnonzero(tree.children_left != -1)[:COMPILED_FOREST_MAX_BATCH]
+    on_threshold = np.tile(X[:1], (len(splits), 1))
+    on_threshold[np.arange(len(splits)), tree.feature[splits]] = tree.threshold[splits]
+    assert np.allclose(fast_predict_proba(model, on_threshold), model.predict_proba(on_threshold))
+
+    # Missing values take the branch sklearn learned for them, whatever the batch size
+    for n_rows in (1, COMPILED_FOREST_MAX_BATCH + 1):
+        batch = X[:n_rows].copy()
+        batch[:, 0] = np.nan
+        assert np.allclose(fast_predict_proba(model, batch), model.predict_proba(batch)), n_rows
+
+if __name__ == "__main__":
+    test_fast_predict_proba_matches_sklearn()
+    print("Compiled forest matches sklearn")
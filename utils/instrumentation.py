@@ -0,0 +1,262 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+def _rss_peak_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def _rss_mb() -> Optional[float]:
+    # Current resident set size; only Linux exposes it without a dependency
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+class _NullStage:
+    """
+    Stage returned while instrumentation is disabled; every operation is a no-op.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    def __init__(self, owner: "Instrumentation", name: str, rows: Optional[int], attrs: Dict[str, Any]):
+        self.owner = owner
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs
+        self.child_peak = 0
+
+    def __enter__(self):
+        self.owner._enter(self)
+        self.rss_start = _rss_mb()
+        self.start = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        peak = self.owner._exit(self)
+        # RSS when the stage started and ended, and the peak RSS of the whole
+        # process so far (the kernel keeps no per-stage peak)
+        self.owner.record(self.name, wall, cpu=cpu, rows=self.rows, start=self.start,
+                          traced_peak_mb=peak, rss_start_mb=self.rss_start, rss_end_mb=_rss_mb(),
+                          process_rss_peak_mb=_rss_peak_mb(),
+                          failed=exc_type is not None or None, **self.attrs)
+        return False
+
+class Instrumentation:
+    """
+    Collects wall time, CPU time, memory and row counts for pipeline stages.
+    
+    Pipeline code wraps its stages in `with stage(name, rows=n):`. While
+    disabled (the default) that returns a shared no-op context, so the cost
+    is one attribute check. Work done in other processes, such as CV folds,
+    is added with record(), using timings the worker measured itself.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.records: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stack = threading.local()
+
+    def enable(self, trace_memory: bool = False) -> None:
+        """
+        Start collecting stage records.
+        
+        Args:
+            trace_memory: Also track the peak Python/numpy heap per stage with
+                tracemalloc, which slows allocation-heavy code down noticeably
+        """
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self.started_at = time.time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records = []
+        self.started_at = time.time()
+
+    def stage(self, name: str, rows: Optional[int] = None, **attrs):
+        """
+        Context manager timing one stage. Assign `.rows` on the returned
+        object when the row count is only known inside the stage.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows, attrs)
+
+    def record(self, name: str, wall: float, cpu: Optional[float] = None, rows: Optional[int] = None,
+               start: Optional[float] = None, pid: Optional[int] = None, tid: Optional[int] = None,
+               **attrs) -> None:
+        """
+        Add a stage measured elsewhere, e.g. in a worker process.
+        
+        Args:
+            name: Stage name
+            wall: Wall time in seconds
+            cpu: CPU time in seconds
+            rows: Rows processed
+            start: Start time as a time.time() timestamp
+            pid: Process that ran the stage (default: this process)
+            tid: Thread that ran the stage (default: this thread)
+            **attrs: Extra values stored with the record; None values are dropped
+        """
+        if not self.enabled:
+            return
+        entry = {
+            'name': name,
+            'start': start if start is not None else time.time() - wall,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'rows': rows,
+            'rows_per_s': rows / wall if rows and wall > 0 else None,
+            'pid': pid if pid is not None else os.getpid(),
+            'tid': tid if tid is not None else threading.get_ident(),
+        }
+        entry.update(attrs)
+        entry = {key: value for key, value in entry.items() if value is not None}
+        with self._lock:
+            self.records.append(entry)
+
+    def _enter(self, stage: _Stage) -> None:
+        if not self.trace_memory:
+            return
+        stack = self._stage_stack()
+        if stack:
+            # Keep the parent's peak so far before resetting it for the child
+            stack[-1].child_peak = max(stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        stack.append(stage)
+
+    def _exit(self, stage: _Stage) -> Optional[float]:
+        if not self.trace_memory:
+            return None
+        stack = self._stage_stack()
+        peak = max(tracemalloc.get_traced_memory()[1], stage.child_peak)
+        if stack and stack[-1] is stage:
+            stack.pop()
+        if stack:
+            stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        return peak / 1024 ** 2
+
+    def _stage_stack(self) -> List[_Stage]:
+        if not hasattr(self._stack, 'stages'):
+            self._stack.stages = []
+        return self._stack.stages
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Machine-readable run report: every record plus per-stage totals.
+        """
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r['start'])
+        totals: Dict[str, Dict[str, Any]] = {}
+        for entry in records:
+            total = totals.setdefault(entry['name'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0})
+            total['count'] += 1
+            total['wall_s'] += entry['wall_s']
+            total['cpu_s'] += entry.get('cpu_s', 0.0)
+            total['rows'] += entry.get('rows', 0)
+        return {
+            'started_at': self.started_at,
+            'pid': os.getpid(),
+            'trace_memory': self.trace_memory,
+            'rss_peak_mb': _rss_peak_mb(),
+            'stages': totals,
+            'records': records,
+        }
+
+    def summary(self) -> str:
+        """
+        Per-stage totals as a text table for the console.
+        """
+        lines = [f"{'stage':<16}{'count':>7}{'wall s':>10}{'cpu s':>10}{'rows/s':>12}"]
+        for name, total in self.report()['stages'].items():
+            rate = total['rows'] / total['wall_s'] if total['rows'] and total['wall_s'] > 0 else None
+            rate_text = f"{rate:,.0f}" if rate is not None else '-'
+            lines.append(f"{name:<16}{total['count']:>7}{total['wall_s']:>10.2f}{total['cpu_s']:>10.2f}{rate_text:>12}")
+        return "\n".join(lines)
+
+    def save_report(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        print(f"Run report saved to {path}")
+
+    def save_chrome_trace(self, path: str) -> None:
+        """
+        Write the records in Chrome trace event format (chrome://tracing, Perfetto).
+        """
+        with self._lock:
+            records = list(self.records)
+        events = []
+        for entry in records:
+            args = {key: value for key, value in entry.items()
+                    if key not in ('name', 'start', 'wall_s', 'pid', 'tid')}
+            events.append({
+                'name': entry['name'],
+                'ph': 'X',
+                'ts': (entry['start'] - self.started_at) * 1e6,
+                'dur': entry['wall_s'] * 1e6,
+                'pid': entry['pid'],
+                'tid': entry['tid'],
+                'args': args,
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        print(f"Chrome trace saved to {path}")
+
+# Process-wide instance the pipeline reports into
+instrumentation = Instrumentation()
+
+def stage(name: str, rows: Optional[int] = None, **attrs):
+    """
+    Time a stage with the process-wide instrumentation.
+    """
+    return instrumentation.stage(name, rows, **attrs)
+
+def worker_timer():
+    """
+    Start timestamps for timing work in a worker process; pass the result
+    to worker_timing() when the work is done.
+    """
+    return time.time(), time.perf_counter(), time.process_time()
+
+def worker_timing(started) -> Dict[str, Any]:
+    """
+    Timing measured in a worker, in the keyword form accepted by record().
+    """
+    start, wall_start, cpu_start = started
+    return {'start': start, 'wall': time.perf_counter() - wall_start,
+            'cpu': time.process_time() - cpu_start, 'pid': os.getpid(), 'tid': threading.get_ident()}
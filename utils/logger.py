@@ -1,36 +1,129 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Dict, Optional
+from config import LOG_DIR, LOG_DEBUG_RATE_LIMIT, LOG_DEBUG_SAMPLE_EVERY
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the message and traceback before enqueueing,
+    which puts string formatting back on the calling thread. Records stay in
+    this process, so they can be enqueued as they are. Log arguments are
+    formatted later, so pass values rather than objects that are mutated
+    right after the call.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class DebugSampler(logging.Filter):
+    """
+    Drops DEBUG records beyond a sampling rate and a per-second budget.
+
+    The next record let through after drops is annotated with how many were
+    suppressed. Records above DEBUG always pass.
+    """
+    def __init__(self, max_per_second: Optional[float] = LOG_DEBUG_RATE_LIMIT,
+                 sample_every: int = LOG_DEBUG_SAMPLE_EVERY):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.sample_every = max(1, int(sample_every))
+        self._seen = 0
+        self._suppressed = 0
+        self._tokens = max_per_second or 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        with self._lock:
+            self._seen += 1
+            allowed = self._seen % self.sample_every == 0
+            if allowed and self.max_per_second is not None:
+                now = time.monotonic()
+                self._tokens = min(self.max_per_second, self._tokens + (now - self._last) * self.max_per_second)
+                self._last = now
+                allowed = self._tokens >= 1
+                if allowed:
+                    self._tokens -= 1
+            if not allowed:
+                self._suppressed += 1
+                return False
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} debug records suppressed)"
+        return True
+
+# Loggers configured by this module, and the listener writing each one's records
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_configure_lock = threading.Lock()
+
+def _configure(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    with _configure_lock:
+        if name in _listeners:
+            return logger
 
-class Logger:
-    def __init__(self, name):
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
-        
         # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        
-        # Create file handler
+        os.makedirs(LOG_DIR, exist_ok=True)
+
+        # File and console handlers run on the listener thread
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = f'logs/{name}_{timestamp}.log'
-        file_handler = logging.FileHandler(log_file)
+        file_handler = logging.FileHandler(f'{LOG_DIR}/{name}_{timestamp}.log')
         file_handler.setLevel(logging.DEBUG)
-        
-        # Create console handler
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
-        
-        # Create formatter and add it to the handlers
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        formatter = logging.Formatter(LOG_FORMAT)
         file_handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
-        
-        # Add the handlers to the logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-    
+
+        # The calling thread only appends the record to a queue
+        records = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(records)
+        queue_handler.addFilter(DebugSampler())
+        listener = logging.handlers.QueueListener(records, file_handler, console_handler,
+                                                  respect_handler_level=True)
+        listener.start()
+
+        logger.setLevel(logging.DEBUG)
+        for handler in [h for h in logger.handlers if isinstance(h, _DeferredQueueHandler)]:
+            # Left over from before shutdown()
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        _listeners[name] = listener
+    return logger
+
+def shutdown() -> None:
+    """
+    Flush queued records and stop the background writers.
+    """
+    with _configure_lock:
+        for listener in _listeners.values():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        _listeners.clear()
+
+atexit.register(shutdown)
+
+class Logger:
+    """
+    Named logger whose records are written by a background thread.
+
+    Each name is configured once per process, so creating Logger('gui')
+    again returns the same logger and log file instead of adding handlers.
+    """
+    def __init__(self, name):
+        self.logger = _configure(name)
+
     def get_logger(self):
         return self.logger